@@ -0,0 +1,56 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from sales_app import SalesDB
+
+
+def run_operations(db, iterations):
+    """Выполнение набора типичных действий меню, возвращает число операций в секунду"""
+    operations = [
+        db.display_max_sale,
+        db.display_top_salesman,
+        db.display_top_customer,
+        lambda: db.display_salesman_max_sale(1),
+        lambda: db.display_avg_customer_purchase(2),
+    ]
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(iterations):
+            for operation in operations:
+                operation()
+    elapsed = time.perf_counter() - start
+
+    return iterations * len(operations) / elapsed
+
+
+def benchmark(iterations=2000, pool_size=5):
+    """Сравнение скорости работы SalesDB с пулом соединений и без него"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench_sales.db')
+
+        # Кэш результатов отключен: иначе повторные запросы не доходят до соединений
+        pooled = SalesDB(db_name, pool_size=pool_size, cache_size=0)
+        pooled.initialize_database()
+        unpooled = SalesDB(db_name, pool_size=0, cache_size=0)
+
+        without_pool = run_operations(unpooled, iterations)
+        with_pool = run_operations(pooled, iterations)
+        pooled.close()
+
+    print(f"Без пула:  {without_pool:,.0f} оп/с")
+    print(f"С пулом:   {with_pool:,.0f} оп/с")
+    print(f"Ускорение: {with_pool / without_pool:.1f}x")
+    return without_pool, with_pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк пула соединений SalesDB")
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--pool-size', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.iterations, args.pool_size)
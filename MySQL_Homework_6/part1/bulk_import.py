@@ -0,0 +1,195 @@
+import argparse
+import csv
+import gzip
+import json
+import sqlite3
+import time
+from datetime import date
+
+from sales_app import SalesDB, SALES_INDEXES, AGGREGATE_TABLES, AGGREGATE_TRIGGERS
+
+
+# Загружаемые столбцы для каждой таблицы
+IMPORT_COLUMNS = {
+    'Sales': ('salesman_id', 'customer_id', 'amount', 'sale_date'),
+    'Salesmen': ('name', 'email', 'phone'),
+    'Customers': ('name', 'email', 'phone'),
+}
+IMPORT_CHUNK_SIZE = 50000
+
+
+def open_source(path):
+    """Открытие файла для чтения, файлы .gz распаковываются на лету"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def read_records(f, fmt):
+    """Построчное чтение записей-словарей из CSV (с заголовком) или JSON Lines"""
+    if fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class SalesValidator:
+    """Проверка строки продажи, внешние ключи сверяются с множествами ID в памяти"""
+
+    def __init__(self, conn):
+        self.salesman_ids = {row[0] for row in conn.execute("SELECT salesman_id FROM Salesmen")}
+        self.customer_ids = {row[0] for row in conn.execute("SELECT customer_id FROM Customers")}
+        self.today = date.today().isoformat()
+
+    def __call__(self, record):
+        salesman_id = int(record['salesman_id'])
+        customer_id = int(record['customer_id'])
+        amount = float(record['amount'])
+        sale_date = record.get('sale_date') or self.today
+
+        if salesman_id not in self.salesman_ids:
+            raise ValueError(f"продавец {salesman_id} не найден")
+        if customer_id not in self.customer_ids:
+            raise ValueError(f"покупатель {customer_id} не найден")
+        if amount < 0:
+            raise ValueError("отрицательная сумма")
+        date.fromisoformat(sale_date)
+
+        return salesman_id, customer_id, amount, sale_date
+
+
+def validate_person(record):
+    """Проверка строки продавца или покупателя"""
+    name = (record.get('name') or '').strip()
+    if not name:
+        raise ValueError("не указано имя")
+    return name, record.get('email') or None, record.get('phone') or None
+
+
+def drop_deferred_structures(conn):
+    """Удаление индексов и триггеров итогов Sales на время загрузки"""
+    for name, (table, columns) in SALES_INDEXES.items():
+        if table == 'Sales':
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for table in AGGREGATE_TABLES:
+        for action in ('insert', 'delete', 'update'):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{action}")
+
+
+def restore_deferred_structures(db, conn):
+    """Восстановление индексов Sales, пересчет итогов и возврат триггеров"""
+    for name, (table, columns) in SALES_INDEXES.items():
+        if table == 'Sales':
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    for table, key in AGGREGATE_TABLES.items():
+        db.rebuild_aggregates(conn, table)
+        for trigger in AGGREGATE_TRIGGERS:
+            conn.execute(trigger.format(table=table, key=key))
+
+
+def bulk_import(db, path, table='Sales', fmt=None, chunk_size=IMPORT_CHUNK_SIZE,
+                defer_indexes=False, max_errors=100):
+    """Массовая загрузка строк из CSV или JSON Lines в таблицу.
+
+    Файл читается пачками по chunk_size строк, каждая пачка вставляется
+    одним executemany. Без defer_indexes каждая пачка фиксируется
+    отдельной транзакцией. С defer_indexes (только для Sales) вся загрузка
+    идет одной транзакцией: индексы и триггеры итогов удаляются в начале и
+    восстанавливаются в конце, итоги пересчитываются один раз.
+
+    Возвращает словарь со статистикой: inserted, rejected, seconds,
+    rows_per_sec и errors - первые max_errors пар (номер записи, причина).
+    """
+    if table not in IMPORT_COLUMNS:
+        raise ValueError(f"Загрузка в таблицу {table} не поддерживается")
+    fmt = fmt or detect_format(path)
+    columns = IMPORT_COLUMNS[table]
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    defer_indexes = defer_indexes and table == 'Sales'
+
+    stats = {'inserted': 0, 'rejected': 0, 'errors': []}
+    start = time.perf_counter()
+
+    with db.connection() as conn, open_source(path) as f:
+        validate = SalesValidator(conn) if table == 'Sales' else validate_person
+
+        try:
+            if defer_indexes:
+                # DDL не открывает транзакцию сама, поэтому начинаем ее явно
+                conn.execute("BEGIN")
+                drop_deferred_structures(conn)
+
+            chunk = []
+            for line_no, record in enumerate(read_records(f, fmt), start=1):
+                try:
+                    chunk.append(validate(record))
+                except (KeyError, TypeError, ValueError) as e:
+                    stats['rejected'] += 1
+                    if len(stats['errors']) < max_errors:
+                        stats['errors'].append((line_no, str(e)))
+                    continue
+
+                if len(chunk) >= chunk_size:
+                    conn.executemany(query, chunk)
+                    stats['inserted'] += len(chunk)
+                    chunk = []
+                    if not defer_indexes:
+                        conn.commit()
+
+            if chunk:
+                conn.executemany(query, chunk)
+                stats['inserted'] += len(chunk)
+
+            if defer_indexes:
+                restore_deferred_structures(db, conn)
+            conn.commit()
+            if defer_indexes:
+                # Статистика планировщика для перестроенных индексов после большой загрузки
+                conn.execute("PRAGMA optimize")
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            db.invalidate_cache(table)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_sec'] = stats['inserted'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовая загрузка данных в базу 'Продажи'")
+    parser.add_argument('path', help="файл CSV или JSON Lines (возможно сжатый .gz)")
+    parser.add_argument('--db', default='sales.db', help="файл базы данных")
+    parser.add_argument('--table', default='Sales', choices=sorted(IMPORT_COLUMNS))
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="формат файла (по умолчанию по расширению)")
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="перестроить индексы и итоги после загрузки (для больших файлов)")
+    args = parser.parse_args()
+
+    db = SalesDB(args.db)
+    db.initialize_database()
+    try:
+        stats = bulk_import(db, args.path, args.table, args.format, args.chunk_size, args.defer_indexes)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Ошибка при загрузке: {e}")
+        return
+    finally:
+        db.close()
+
+    print(f"Загружено строк: {stats['inserted']}, отклонено: {stats['rejected']}")
+    print(f"Время: {stats['seconds']:.2f} с, скорость: {stats['rows_per_sec']:,.0f} строк/с")
+    for line_no, reason in stats['errors']:
+        print(f"  запись {line_no}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,142 +1,842 @@
+import csv
+import gzip
+import io
+import json
+import os
+import queue
+import re
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Настройки соединения, применяемые к каждому новому соединению
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,  # ~16 МБ страничного кэша на соединение
+}
+
+# Размер кэша подготовленных выражений sqlite3 на соединение: с запасом
+# вмещает все запросы REPORT_QUERIES, поэтому они компилируются один раз
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений SQLite.
+
+    Поток, уже взявший соединение, при повторном запросе получает то же
+    самое соединение, поэтому вложенные вызовы методов SalesDB не
+    исчерпывают пул. Перед выдачей соединение проверяется запросом SELECT 1,
+    неисправные соединения закрываются и заменяются новыми.
+    """
+
+    def __init__(self, db_name, max_size=5, pragmas=None, timeout=5.0):
+        if max_size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+        self.db_name = db_name
+        self.max_size = max_size
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _create(self):
+        """Открытие нового соединения с применением PRAGMA"""
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self):
+        """Выдача соединения текущему потоку"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        conn = None
+        while conn is None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.max_size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._create()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    break
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"Нет свободных соединений в пуле (размер {self.max_size})")
+
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = None
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Возврат соединения в пул"""
+        if getattr(self._local, 'conn', None) is not conn:
+            raise sqlite3.ProgrammingError("Соединение не принадлежит текущему потоку")
+
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+
+        self._local.conn = None
+        if conn.in_transaction:
+            # Незафиксированные изменения не должны попасть к следующему владельцу
+            conn.rollback()
+
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Закрытие всех свободных соединений пула"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+class QueryCache:
+    """LRU-кэш результатов запросов.
+
+    Каждая запись помнит версии таблиц, из которых она прочитана. Запись
+    данных увеличивает версию таблицы, и все зависящие от нее результаты
+    становятся устаревшими без перебора кэша.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get(self, key, tables):
+        """Возвращает (найдено, значение)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            current = tuple(self._versions.get(table, 0) for table in tables)
+            if entry is None or entry[0] != current:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, versions, value):
+        """Сохранение результата, прочитанного при версиях таблиц versions"""
+        if self.max_size < 1:
+            return
+        with self._lock:
+            self._entries[key] = (versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def query_tables(query):
+    """Таблицы, из которых читает запрос (по FROM и JOIN)"""
+    return tuple(sorted(set(re.findall(r'\b(?:FROM|JOIN)\s+(\w+)', query))))
+
+
+# Управляемый набор индексов таблицы Sales: имя -> (таблица, столбцы)
+SALES_INDEXES = {
+    'idx_sales_salesman_amount': ('Sales', ('salesman_id', 'amount')),
+    'idx_sales_customer_amount': ('Sales', ('customer_id', 'amount')),
+    'idx_sales_date': ('Sales', ('sale_date',)),
+    # Ключ постраничного списка всех сделок (выражение должно совпадать с REPORT_QUERIES)
+    'idx_sales_date_key': ('Sales', ("COALESCE(sale_date, '')", 'sale_id')),
+    'idx_sales_amount': ('Sales', ('amount',)),
+    'idx_salesman_totals_total': ('SalesmanTotals', ('total',)),
+    'idx_customer_totals_total': ('CustomerTotals', ('total',)),
+}
+
+# Таблицы итогов продаж: таблица итогов -> столбец группировки в Sales
+AGGREGATE_TABLES = {
+    'SalesmanTotals': 'salesman_id',
+    'CustomerTotals': 'customer_id',
+}
+
+# Триггеры, поддерживающие таблицу итогов в актуальном состоянии.
+# При удалении минимум и максимум пересчитываются по индексу (key, amount).
+AGGREGATE_TRIGGERS = (
+    '''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_insert
+        AFTER INSERT ON Sales
+        BEGIN
+            INSERT INTO {table} ({key}, total, sale_count, min_amount, max_amount)
+            SELECT NEW.{key}, NEW.amount, 1, NEW.amount, NEW.amount
+            WHERE NEW.{key} IS NOT NULL
+            ON CONFLICT ({key}) DO UPDATE SET
+                total = total + excluded.total,
+                sale_count = sale_count + 1,
+                min_amount = MIN(min_amount, excluded.min_amount),
+                max_amount = MAX(max_amount, excluded.max_amount);
+        END;
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_delete
+        AFTER DELETE ON Sales
+        BEGIN
+            UPDATE {table} SET
+                total = total - OLD.amount,
+                sale_count = sale_count - 1,
+                min_amount = (SELECT MIN(amount) FROM Sales WHERE {key} = OLD.{key}),
+                max_amount = (SELECT MAX(amount) FROM Sales WHERE {key} = OLD.{key})
+            WHERE {key} = OLD.{key};
+            DELETE FROM {table} WHERE {key} = OLD.{key} AND sale_count = 0;
+        END;
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_update
+        AFTER UPDATE OF {key}, amount ON Sales
+        BEGIN
+            UPDATE {table} SET
+                total = total - OLD.amount,
+                sale_count = sale_count - 1,
+                min_amount = (SELECT MIN(amount) FROM Sales WHERE {key} = OLD.{key}),
+                max_amount = (SELECT MAX(amount) FROM Sales WHERE {key} = OLD.{key})
+            WHERE {key} = OLD.{key};
+            DELETE FROM {table} WHERE {key} = OLD.{key} AND sale_count = 0;
+
+            INSERT INTO {table} ({key}, total, sale_count, min_amount, max_amount)
+            SELECT NEW.{key}, NEW.amount, 1, NEW.amount, NEW.amount
+            WHERE NEW.{key} IS NOT NULL
+            ON CONFLICT ({key}) DO UPDATE SET
+                total = total + excluded.total,
+                sale_count = sale_count + 1,
+                min_amount = MIN(min_amount, excluded.min_amount),
+                max_amount = MAX(max_amount, excluded.max_amount);
+        END;
+    ''',
+)
+
+# Запросы отчетов; по ним же выполняется проверка планов запросов
+REPORT_QUERIES = {
+    'all_sales': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        ORDER BY COALESCE(s.sale_date, '') DESC, s.sale_id DESC
+    ''',
+    # Список всех сделок: ключевая пагинация по (sale_date, sale_id); сделки без даты
+    # идут под ключом '', иначе сравнение с NULL пропустило бы их. Отдельное условие
+    # на дату нужно, чтобы поиск шел по индексу (сравнение пар выражений его не использует)
+    'all_sales_first': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        ORDER BY COALESCE(s.sale_date, '') DESC, s.sale_id DESC
+        LIMIT ?
+    ''',
+    'all_sales_after': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE COALESCE(s.sale_date, '') <= COALESCE(?, '')
+          AND (COALESCE(s.sale_date, ''), s.sale_id) < (COALESCE(?, ''), ?)
+        ORDER BY COALESCE(s.sale_date, '') DESC, s.sale_id DESC
+        LIMIT ?
+    ''',
+    'all_sales_before': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE COALESCE(s.sale_date, '') >= COALESCE(?, '')
+          AND (COALESCE(s.sale_date, ''), s.sale_id) > (COALESCE(?, ''), ?)
+        ORDER BY COALESCE(s.sale_date, '') ASC, s.sale_id ASC
+        LIMIT ?
+    ''',
+    'salesman_sales': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE s.salesman_id = ?
+        ORDER BY s.amount DESC
+    ''',
+    # CROSS JOIN фиксирует Sales во внешнем цикле: после ANALYZE на
+    # неравномерных данных планировщик иначе начинает с Customers и
+    # сортирует все продажи во временном B-дереве
+    'max_sale': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        CROSS JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        CROSS JOIN Customers c ON s.customer_id = c.customer_id
+        ORDER BY s.amount DESC
+        LIMIT 1
+    ''',
+    'min_sale': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        CROSS JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        CROSS JOIN Customers c ON s.customer_id = c.customer_id
+        ORDER BY s.amount ASC
+        LIMIT 1
+    ''',
+    'salesman_max_sale': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE s.salesman_id = ?
+        ORDER BY s.amount DESC
+        LIMIT 1
+    ''',
+    'salesman_min_sale': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE s.salesman_id = ?
+        ORDER BY s.amount ASC
+        LIMIT 1
+    ''',
+    'customer_max_sale': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE s.customer_id = ?
+        ORDER BY s.amount DESC
+        LIMIT 1
+    ''',
+    'customer_min_sale': '''
+        SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
+        FROM Sales s
+        JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
+        JOIN Customers c ON s.customer_id = c.customer_id
+        WHERE s.customer_id = ?
+        ORDER BY s.amount ASC
+        LIMIT 1
+    ''',
+    # Итоговые отчеты читаются из таблиц итогов по индексу на total
+    'top_salesman': '''
+        SELECT sm.name, t.total as total_sales
+        FROM SalesmanTotals t
+        JOIN Salesmen sm ON t.salesman_id = sm.salesman_id
+        ORDER BY t.total DESC
+        LIMIT 1
+    ''',
+    'bottom_salesman': '''
+        SELECT sm.name, t.total as total_sales
+        FROM SalesmanTotals t
+        JOIN Salesmen sm ON t.salesman_id = sm.salesman_id
+        ORDER BY t.total ASC
+        LIMIT 1
+    ''',
+    'top_customer': '''
+        SELECT c.name, t.total as total_purchases
+        FROM CustomerTotals t
+        JOIN Customers c ON t.customer_id = c.customer_id
+        ORDER BY t.total DESC
+        LIMIT 1
+    ''',
+    'avg_customer_purchase': '''
+        SELECT c.name, t.total / t.sale_count as avg_purchase
+        FROM CustomerTotals t
+        JOIN Customers c ON t.customer_id = c.customer_id
+        WHERE t.customer_id = ?
+    ''',
+    'avg_salesman_sale': '''
+        SELECT sm.name, t.total / t.sale_count as avg_sale
+        FROM SalesmanTotals t
+        JOIN Salesmen sm ON t.salesman_id = sm.salesman_id
+        WHERE t.salesman_id = ?
+    ''',
+}
+
+
+# Форматы выгрузки результатов в файл
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+EXPORT_BATCH_SIZE = 10000  # строк, читаемых из курсора и записываемых за раз
+EXPORT_BUFFER_SIZE = 1024 * 1024
+# Типы столбцов отчетов в Parquet (классы хранения SQLite); остальные столбцы - TEXT.
+# Схема задается заранее: по первой пачке столбец из одних NULL получил бы тип null
+EXPORT_COLUMN_TYPES = {
+    'sale_id': 'INTEGER',
+    'amount': 'REAL',
+    'total_sales': 'REAL',
+    'total_purchases': 'REAL',
+    'avg_purchase': 'REAL',
+    'avg_sale': 'REAL',
+}
+
+
+def iter_batches(cursor, size=EXPORT_BATCH_SIZE):
+    """Чтение результата запроса пачками через fetchmany"""
+    while True:
+        batch = cursor.fetchmany(size)
+        if not batch:
+            return
+        yield batch
+
+
+def batches_of(rows, size=EXPORT_BATCH_SIZE):
+    """Разбиение произвольного итерируемого набора строк на пачки"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_text_export(f, columns, batches, fmt):
+    """Запись пачек строк в бинарный файл в формате CSV или JSON Lines"""
+    count = 0
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            f.write(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+            count += len(batch)
+        f.write(buffer.getvalue().encode('utf-8'))
+    else:
+        for batch in batches:
+            chunk = ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in batch)
+            f.write(chunk.encode('utf-8'))
+            count += len(batch)
+    return count
+
+
+def write_parquet_export(path, columns, batches, compress):
+    """Запись пачек строк в Parquet (по группе строк на пачку), требуется pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet установите пакет pyarrow") from None
+
+    types = {'INTEGER': pa.int64(), 'REAL': pa.float64(), 'TEXT': pa.string()}
+    schema = pa.schema([(name, types[EXPORT_COLUMN_TYPES.get(name, 'TEXT')]) for name in columns])
+
+    # Файл создается и при пустом результате (пустая таблица с этой схемой)
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='gzip' if compress else 'snappy') as writer:
+        for batch in batches:
+            table = pa.Table.from_pydict({name: [row[i] for row in batch] for i, name in enumerate(columns)},
+                                         schema=schema)
+            writer.write_table(table)
+            count += len(batch)
+    return count
+
+
+def write_export(path, columns, batches, fmt='csv', compress=False):
+    """Потоковая запись результатов в файл.
+
+    Данные пишутся во временный файл рядом с целевым, который по
+    завершении атомарно переименовывается, поэтому прерванная выгрузка
+    не оставляет наполовину записанный файл. Возвращает число строк.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    tmp_path = f"{path}.tmp"
+    try:
+        if fmt == 'parquet':
+            count = write_parquet_export(tmp_path, columns, batches, compress)
+        else:
+            with open(tmp_path, 'wb', buffering=EXPORT_BUFFER_SIZE) as raw:
+                if compress:
+                    with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                        count = write_text_export(f, columns, batches, fmt)
+                else:
+                    count = write_text_export(raw, columns, batches, fmt)
+                raw.flush()
+                os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+# Результаты пакетных операций для каждого ID
+BATCH_UPDATED = 'updated'
+BATCH_DELETED = 'deleted'
+BATCH_NOT_FOUND = 'not_found'
+BATCH_HAS_SALES = 'has_sales'
+BATCH_ERROR = 'error'
+
+
+def unique_ids(ids):
+    """Список ID без повторов с сохранением порядка"""
+    return list(dict.fromkeys(int(i) for i in ids))
+
+
+def parse_ids(text):
+    """Разбор списка ID, введенных через запятую или пробел"""
+    return [int(part) for part in re.split(r'[,\s]+', text.strip()) if part]
 
 
 # Создание трёхтабличной базы данных Sales (продажи) (Задание 1)
 class SalesDB:
-    def __init__(self, db_name='sales.db'):
+    def __init__(self, db_name='sales.db', pool_size=5, pragmas=None, cache_size=256):
         self.db_name = db_name
         self.export_path = 'results.txt'  # путь по умолчанию для сохранения
+        self.page_size = 50  # число сделок на странице при постраничном просмотре
+
+        # pool_size=0 отключает пул: каждая операция открывает своё соединение
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.pool = ConnectionPool(db_name, pool_size, self.pragmas) if pool_size else None
+
+        # Реестр запросов отчетов: имя -> (SQL, таблицы-источники)
+        self.queries = {name: (sql, query_tables(sql)) for name, sql in REPORT_QUERIES.items()}
+        self.cache = QueryCache(cache_size)
 
     def connect(self):
-        return sqlite3.connect(self.db_name)
+        conn = sqlite3.connect(self.db_name, cached_statements=STATEMENT_CACHE_SIZE)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Соединение для одной операции: из пула или новое, если пул отключен"""
+        if self.pool is None:
+            conn = self.connect()
+            try:
+                yield conn
+            finally:
+                conn.close()
+        else:
+            with self.pool.connection() as conn:
+                yield conn
+
+    def close(self):
+        """Закрытие соединений пула"""
+        if self.pool is not None:
+            self.pool.close()
+
+    def query(self, name, params=(), one=False, cache=True):
+        """Выполнение запроса из реестра с кэшированием результата.
+
+        Возвращает список строк, а при one=True - первую строку или None.
+        """
+        sql, tables = self.queries[name]
+        key = (name, tuple(params), one)
+
+        if cache:
+            found, value = self.cache.get(key, tables)
+            if found:
+                return list(value) if not one else value
+            versions = self.cache.versions(tables)
+
+        with self.connection() as conn:
+            cursor = conn.execute(sql, params)
+            value = cursor.fetchone() if one else cursor.fetchall()
+
+        if cache:
+            self.cache.put(key, versions, value if one else tuple(value))
+        return value
+
+    def invalidate_cache(self, *tables):
+        """Сброс кэшированных результатов, зависящих от измененных таблиц"""
+        if 'Sales' in tables:
+            # Таблицы итогов меняются триггерами вместе с Sales
+            tables += tuple(AGGREGATE_TABLES)
+        self.cache.invalidate(*tables)
 
     def initialize_database(self):
         """Инициализация базы данных и создание таблиц"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        # Создание таблицы Salesmen (продавцы)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Salesmen (
-                salesman_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT,
-                phone TEXT
-            )
-        ''')
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        # Создание таблицы Customers (покупатели)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Customers (
-                customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT,
-                phone TEXT
-            )
-        ''')
+            # Создание таблицы Salesmen (продавцы)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Salesmen (
+                    salesman_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    email TEXT,
+                    phone TEXT
+                )
+            ''')
+
+            # Создание таблицы Customers (покупатели)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Customers (
+                    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    email TEXT,
+                    phone TEXT
+                )
+            ''')
+
+            # Создание таблицы Sales (продажи)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Sales (
+                    sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    salesman_id INTEGER,
+                    customer_id INTEGER,
+                    amount REAL NOT NULL,
+                    sale_date DATE DEFAULT CURRENT_DATE,
+                    FOREIGN KEY (salesman_id) REFERENCES Salesmen(salesman_id),
+                    FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
+                )
+            ''')
 
-        # Создание таблицы Sales (продажи)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Sales (
-                sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                salesman_id INTEGER,
-                customer_id INTEGER,
-                amount REAL NOT NULL,
-                sale_date DATE DEFAULT CURRENT_DATE,
-                FOREIGN KEY (salesman_id) REFERENCES Salesmen(salesman_id),
-                FOREIGN KEY (customer_id) REFERENCES Customers(customer_id)
-            )
-        ''')
+            conn.commit()
 
-        conn.commit()
-        conn.close()
+        self.create_aggregates()
+        self.create_indexes()
 
         # Добавление тестовых данных, если таблицы пустые
         self.add_sample_data()
 
+        # Проверка, что отчеты используют индексы
+        self.check_query_plans()
+
+    def create_aggregates(self):
+        """Создание таблиц итогов по продавцам и покупателям и их триггеров"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            for table, key in AGGREGATE_TABLES.items():
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+                is_new = cursor.fetchone() is None
+
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        {key} INTEGER PRIMARY KEY,
+                        total REAL NOT NULL,
+                        sale_count INTEGER NOT NULL,
+                        min_amount REAL,
+                        max_amount REAL
+                    )
+                ''')
+                for trigger in AGGREGATE_TRIGGERS:
+                    cursor.execute(trigger.format(table=table, key=key))
+
+                # Итоги для продаж, добавленных до появления таблицы
+                if is_new:
+                    self.rebuild_aggregates(conn, table)
+
+            conn.commit()
+
+    def rebuild_aggregates(self, conn, table):
+        """Полный пересчет таблицы итогов по данным Sales"""
+        key = AGGREGATE_TABLES[table]
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f'''
+            INSERT INTO {table} ({key}, total, sale_count, min_amount, max_amount)
+            SELECT {key}, SUM(amount), COUNT(*), MIN(amount), MAX(amount)
+            FROM Sales
+            WHERE {key} IS NOT NULL
+            GROUP BY {key}
+        ''')
+
+    def create_indexes(self):
+        """Создание индексов для отчетов (повторный вызов безопасен)"""
+        with self.connection() as conn:
+            for name, (table, columns) in SALES_INDEXES.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+            conn.commit()
+            # Обновление статистики планировщика для новых индексов
+            conn.execute("PRAGMA optimize")
+
+    def check_query_plans(self):
+        """Проверка планов запросов отчетов через EXPLAIN QUERY PLAN.
+
+        Возвращает словарь {отчет: [шаги плана]} для отчетов, в которых
+        встречается полный просмотр таблицы без индекса или временное
+        B-дерево для сортировки.
+        """
+        degraded = {}
+        with self.connection() as conn:
+            for name, query in REPORT_QUERIES.items():
+                params = (0,) * query.count('?')
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+                bad_steps = [step for step in plan
+                             if (step.startswith('SCAN ') and ' USING ' not in step)
+                             or step.startswith('USE TEMP B-TREE')]
+                if bad_steps:
+                    degraded[name] = bad_steps
+
+        for name, steps in degraded.items():
+            print(f"Предупреждение: отчет '{name}' не использует индекс: {'; '.join(steps)}")
+        return degraded
+
     def add_sample_data(self):
         """Добавление тестовых данных"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT COUNT(*) FROM Salesmen")
-        if cursor.fetchone()[0] == 0:
-            # Продавцы
-            salesmen = [
-                ('Антон Морозов', 'morozov@mail.com', '+79031234567'),
-                ('Екатерина Волкова', 'volkova@mail.com', '+79039876543'),
-                ('Дмитрий Орлов', 'orlov@mail.com', '+79035558899')
-            ]
-            cursor.executemany(
-                "INSERT INTO Salesmen (name, email, phone) VALUES (?, ?, ?)",
-                salesmen
-            )
-
-            # Покупатели
-            customers = [
-                ('ООО "Альфа"', 'alpha@company.ru', '+74951112233'),
-                ('ИП Кузнецов', 'kuznetsov@ip.ru', '+79164445566'),
-                ('ООО "Гамма"', 'gamma@company.ru', '+74957778899')
-            ]
-            cursor.executemany(
-                "INSERT INTO Customers (name, email, phone) VALUES (?, ?, ?)",
-                customers
-            )
-
-            # Продажи
-            sales = [
-                (1, 1, 13200.00),
-                (1, 2, 9100.50),
-                (2, 1, 27800.75),
-                (2, 3, 15400.00),
-                (3, 2, 18750.25),
-                (3, 3, 6400.00)
-            ]
-            cursor.executemany(
-                "INSERT INTO Sales (salesman_id, customer_id, amount) VALUES (?, ?, ?)",
-                sales
-            )
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT COUNT(*) FROM Salesmen")
+            if cursor.fetchone()[0] == 0:
+                # Продавцы
+                salesmen = [
+                    ('Антон Морозов', 'morozov@mail.com', '+79031234567'),
+                    ('Екатерина Волкова', 'volkova@mail.com', '+79039876543'),
+                    ('Дмитрий Орлов', 'orlov@mail.com', '+79035558899')
+                ]
+                cursor.executemany(
+                    "INSERT INTO Salesmen (name, email, phone) VALUES (?, ?, ?)",
+                    salesmen
+                )
+
+                # Покупатели
+                customers = [
+                    ('ООО "Альфа"', 'alpha@company.ru', '+74951112233'),
+                    ('ИП Кузнецов', 'kuznetsov@ip.ru', '+79164445566'),
+                    ('ООО "Гамма"', 'gamma@company.ru', '+74957778899')
+                ]
+                cursor.executemany(
+                    "INSERT INTO Customers (name, email, phone) VALUES (?, ?, ?)",
+                    customers
+                )
+
+                # Продажи
+                sales = [
+                    (1, 1, 13200.00),
+                    (1, 2, 9100.50),
+                    (2, 1, 27800.75),
+                    (2, 3, 15400.00),
+                    (3, 2, 18750.25),
+                    (3, 3, 6400.00)
+                ]
+                cursor.executemany(
+                    "INSERT INTO Sales (salesman_id, customer_id, amount) VALUES (?, ?, ?)",
+                    sales
+                )
+
+                conn.commit()
+
+    def fetch_sales_page(self, key=None, backward=False, page_size=None):
+        """Одна страница списка всех сделок (от новых к старым).
+
+        key - пара (sale_date, sale_id) граничной сделки соседней страницы:
+        возвращаются сделки после нее, а при backward=True - перед ней.
+        Без key возвращается первая страница.
+        """
+        page_size = page_size or self.page_size
+
+        # Страницы не кэшируются: при полном обходе они вытеснили бы из кэша все остальное
+        if key is None:
+            page = self.query('all_sales_first', (page_size,), cache=False)
+        elif backward:
+            page = self.query('all_sales_before', (key[0], *key, page_size), cache=False)
+        else:
+            page = self.query('all_sales_after', (key[0], *key, page_size), cache=False)
 
-            conn.commit()
+        if backward:
+            page.reverse()
+        return page
+
+    def stream_all_sales(self, page_size=None):
+        """Генератор всех сделок; в памяти одновременно не больше одной страницы"""
+        page_size = page_size or self.page_size
+        key = None
 
-        conn.close()
+        while True:
+            page = self.fetch_sales_page(key, page_size=page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            key = (page[-1][4], page[-1][0])
 
     def display_all_sales(self):
-        """Отображение всех сделок"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            ORDER BY s.sale_date DESC
-        ''')
+        """Отображение всех сделок (страницы выводятся по мере чтения).
 
-        results = cursor.fetchall()
+        Строки не накапливаются, возвращается их число; сами строки дает
+        stream_all_sales.
+        """
         print("\n=== ВСЕ СДЕЛКИ ===")
-        for row in results:
+        count = 0
+        for row in self.stream_all_sales():
             print(f"ID: {row[0]}, Продавец: {row[1]}, Покупатель: {row[2]}, Сумма: {row[3]:.2f}, Дата: {row[4]}")
+            count += 1
 
-        conn.close()
-        return results
+        return count
 
     def display_salesman_sales(self, salesman_id):
         """Отображение сделок конкретного продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            WHERE s.salesman_id = ?
-            ORDER BY s.amount DESC
-        ''', (salesman_id,))
-
-        results = cursor.fetchall()
+        results = self.query('salesman_sales', (salesman_id,))
         if results:
             print(f"\n=== СДЕЛКИ ПРОДАВЦА {results[0][1]} ===")
             for row in results:
@@ -144,459 +844,432 @@ class SalesDB:
         else:
             print("Продавец не найден или у него нет сделок")
 
-        conn.close()
         return results
 
     def display_max_sale(self):
         """Отображение максимальной по сумме сделки"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            ORDER BY s.amount DESC
-            LIMIT 1
-        ''')
-
-        result = cursor.fetchone()
+        result = self.query('max_sale', one=True)
         if result:
             print("\n=== МАКСИМАЛЬНАЯ СДЕЛКА ===")
             print(
                 f"ID: {result[0]}, Продавец: {result[1]}, Покупатель: {result[2]}, Сумма: {result[3]:.2f}, Дата: {result[4]}")
 
-        conn.close()
         return [result] if result else []
 
     def display_min_sale(self):
         """Отображение минимальной по сумме сделки"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            ORDER BY s.amount ASC
-            LIMIT 1
-        ''')
-
-        result = cursor.fetchone()
+        result = self.query('min_sale', one=True)
         if result:
             print("\n=== МИНИМАЛЬНАЯ СДЕЛКА ===")
             print(
                 f"ID: {result[0]}, Продавец: {result[1]}, Покупатель: {result[2]}, Сумма: {result[3]:.2f}, Дата: {result[4]}")
 
-        conn.close()
         return [result] if result else []
 
     def display_salesman_max_sale(self, salesman_id):
         """Отображение максимальной по сумме сделки для конкретного продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            WHERE s.salesman_id = ?
-            ORDER BY s.amount DESC
-            LIMIT 1
-        ''', (salesman_id,))
-
-        result = cursor.fetchone()
+        result = self.query('salesman_max_sale', (salesman_id,), one=True)
         if result:
             print(f"\n=== МАКСИМАЛЬНАЯ СДЕЛКА ПРОДАВЦА {result[1]} ===")
             print(f"ID: {result[0]}, Покупатель: {result[2]}, Сумма: {result[3]:.2f}, Дата: {result[4]}")
         else:
             print("Продавец не найден или у него нет сделок")
 
-        conn.close()
         return [result] if result else []
 
     def display_salesman_min_sale(self, salesman_id):
         """Отображение минимальной по сумме сделки для конкретного продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            WHERE s.salesman_id = ?
-            ORDER BY s.amount ASC
-            LIMIT 1
-        ''', (salesman_id,))
-
-        result = cursor.fetchone()
+        result = self.query('salesman_min_sale', (salesman_id,), one=True)
         if result:
             print(f"\n=== МИНИМАЛЬНАЯ СДЕЛКА ПРОДАВЦА {result[1]} ===")
             print(f"ID: {result[0]}, Покупатель: {result[2]}, Сумма: {result[3]:.2f}, Дата: {result[4]}")
         else:
             print("Продавец не найден или у него нет сделок")
 
-        conn.close()
         return [result] if result else []
 
     def display_customer_max_sale(self, customer_id):
         """Отображение максимальной по сумме сделки для конкретного покупателя"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            WHERE s.customer_id = ?
-            ORDER BY s.amount DESC
-            LIMIT 1
-        ''', (customer_id,))
-
-        result = cursor.fetchone()
+        result = self.query('customer_max_sale', (customer_id,), one=True)
         if result:
             print(f"\n=== МАКСИМАЛЬНАЯ СДЕЛКА ПОКУПАТЕЛЯ {result[2]} ===")
             print(f"ID: {result[0]}, Продавец: {result[1]}, Сумма: {result[3]:.2f}, Дата: {result[4]}")
         else:
             print("Покупатель не найден или у него нет сделок")
 
-        conn.close()
         return [result] if result else []
 
     def display_customer_min_sale(self, customer_id):
         """Отображение минимальной по сумме сделки для конкретного покупателя"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT s.sale_id, sm.name as salesman, c.name as customer, s.amount, s.sale_date
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            JOIN Customers c ON s.customer_id = c.customer_id
-            WHERE s.customer_id = ?
-            ORDER BY s.amount ASC
-            LIMIT 1
-        ''', (customer_id,))
-
-        result = cursor.fetchone()
+        result = self.query('customer_min_sale', (customer_id,), one=True)
         if result:
             print(f"\n=== МИНИМАЛЬНАЯ СДЕЛКА ПОКУПАТЕЛЯ {result[2]} ===")
             print(f"ID: {result[0]}, Продавец: {result[1]}, Сумма: {result[3]:.2f}, Дата: {result[4]}")
         else:
             print("Покупатель не найден или у него нет сделок")
 
-        conn.close()
         return [result] if result else []
 
     def display_top_salesman(self):
         """Отображение продавца с максимальной суммой продаж"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT sm.name, SUM(s.amount) as total_sales
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            GROUP BY sm.salesman_id
-            ORDER BY total_sales DESC
-            LIMIT 1
-        ''')
-
-        result = cursor.fetchone()
+        result = self.query('top_salesman', one=True)
         if result:
             print("\n=== ПРОДАВЕЦ С МАКСИМАЛЬНОЙ СУММОЙ ПРОДАЖ ===")
             print(f"Продавец: {result[0]}, Общая сумма: {result[1]:.2f}")
 
-        conn.close()
         return [result] if result else []
 
     def display_bottom_salesman(self):
         """Отображение продавца с минимальной суммой продаж"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT sm.name, SUM(s.amount) as total_sales
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            GROUP BY sm.salesman_id
-            ORDER BY total_sales ASC
-            LIMIT 1
-        ''')
-
-        result = cursor.fetchone()
+        result = self.query('bottom_salesman', one=True)
         if result:
             print("\n=== ПРОДАВЕЦ С МИНИМАЛЬНОЙ СУММОЙ ПРОДАЖ ===")
             print(f"Продавец: {result[0]}, Общая сумма: {result[1]:.2f}")
 
-        conn.close()
         return [result] if result else []
 
     def display_top_customer(self):
         """Отображение покупателя с максимальной суммой покупок"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT c.name, SUM(s.amount) as total_purchases
-            FROM Sales s
-            JOIN Customers c ON s.customer_id = c.customer_id
-            GROUP BY c.customer_id
-            ORDER BY total_purchases DESC
-            LIMIT 1
-        ''')
-
-        result = cursor.fetchone()
+        result = self.query('top_customer', one=True)
         if result:
             print("\n=== ПОКУПАТЕЛЬ С МАКСИМАЛЬНОЙ СУММОЙ ПОКУПОК ===")
             print(f"Покупатель: {result[0]}, Общая сумма: {result[1]:.2f}")
 
-        conn.close()
         return [result] if result else []
 
     def display_avg_customer_purchase(self, customer_id):
         """Отображение средней суммы покупки для конкретного покупателя"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT c.name, AVG(s.amount) as avg_purchase
-            FROM Sales s
-            JOIN Customers c ON s.customer_id = c.customer_id
-            WHERE s.customer_id = ?
-            GROUP BY c.customer_id
-        ''', (customer_id,))
-
-        result = cursor.fetchone()
+        result = self.query('avg_customer_purchase', (customer_id,), one=True)
         if result:
             print(f"\n=== СРЕДНЯЯ СУММА ПОКУПКИ ПОКУПАТЕЛЯ {result[0]} ===")
             print(f"Средняя сумма: {result[1]:.2f}")
         else:
             print("Покупатель не найден или у него нет сделок")
 
-        conn.close()
         return [result] if result else []
 
     def display_avg_salesman_sale(self, salesman_id):
         """Отображение средней суммы покупки для конкретного продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT sm.name, AVG(s.amount) as avg_sale
-            FROM Sales s
-            JOIN Salesmen sm ON s.salesman_id = sm.salesman_id
-            WHERE s.salesman_id = ?
-            GROUP BY sm.salesman_id
-        ''', (salesman_id,))
-
-        result = cursor.fetchone()
+        result = self.query('avg_salesman_sale', (salesman_id,), one=True)
         if result:
             print(f"\n=== СРЕДНЯЯ СУММА ПРОДАЖИ ПРОДАВЦА {result[0]} ===")
             print(f"Средняя сумма: {result[1]:.2f}")
         else:
             print("Продавец не найден или у него нет сделок")
 
-        conn.close()
         return [result] if result else []
 
     # Методы для работы с данными (Задание 2)
     def insert_sale(self, salesman_id, customer_id, amount):
         """Добавление новой продажи"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute('''
-                INSERT INTO Sales (salesman_id, customer_id, amount)
-                VALUES (?, ?, ?)
-            ''', (salesman_id, customer_id, amount))
-            conn.commit()
-            print("Продажа успешно добавлена!")
-        except sqlite3.Error as e:
-            print(f"Ошибка при добавлении продажи: {e}")
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute('''
+                    INSERT INTO Sales (salesman_id, customer_id, amount)
+                    VALUES (?, ?, ?)
+                ''', (salesman_id, customer_id, amount))
+                conn.commit()
+                self.invalidate_cache('Sales')
+                print("Продажа успешно добавлена!")
+            except sqlite3.Error as e:
+                print(f"Ошибка при добавлении продажи: {e}")
 
     def update_sale(self, sale_id, amount):
         """Обновление суммы продажи"""
-        conn = self.connect()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute('''
-                UPDATE Sales SET amount = ? WHERE sale_id = ?
-            ''', (amount, sale_id))
+            try:
+                cursor.execute('''
+                    UPDATE Sales SET amount = ? WHERE sale_id = ?
+                ''', (amount, sale_id))
 
-            if cursor.rowcount > 0:
-                print("Продажа успешно обновлена!")
-            else:
-                print("Продажа с указанным ID не найдена")
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при обновлении продажи: {e}")
-        finally:
-            conn.close()
+                if cursor.rowcount > 0:
+                    print("Продажа успешно обновлена!")
+                else:
+                    print("Продажа с указанным ID не найдена")
+                conn.commit()
+                self.invalidate_cache('Sales')
+            except sqlite3.Error as e:
+                print(f"Ошибка при обновлении продажи: {e}")
 
     def delete_sale(self, sale_id):
         """Удаление продажи"""
-        conn = self.connect()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute('DELETE FROM Sales WHERE sale_id = ?', (sale_id,))
+            try:
+                cursor.execute('DELETE FROM Sales WHERE sale_id = ?', (sale_id,))
 
-            if cursor.rowcount > 0:
-                print("Продажа успешно удалена!")
-            else:
-                print("Продажа с указанным ID не найдена")
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при удалении продажи: {e}")
-        finally:
-            conn.close()
+                if cursor.rowcount > 0:
+                    print("Продажа успешно удалена!")
+                else:
+                    print("Продажа с указанным ID не найдена")
+                conn.commit()
+                self.invalidate_cache('Sales')
+            except sqlite3.Error as e:
+                print(f"Ошибка при удалении продажи: {e}")
 
     def insert_salesman(self, name, email, phone):
         """Добавление нового продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute('''
-                INSERT INTO Salesmen (name, email, phone)
-                VALUES (?, ?, ?)
-            ''', (name, email, phone))
-            conn.commit()
-            print("Продавец успешно добавлен!")
-        except sqlite3.Error as e:
-            print(f"Ошибка при добавлении продавца: {e}")
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute('''
+                    INSERT INTO Salesmen (name, email, phone)
+                    VALUES (?, ?, ?)
+                ''', (name, email, phone))
+                conn.commit()
+                self.invalidate_cache('Salesmen')
+                print("Продавец успешно добавлен!")
+            except sqlite3.Error as e:
+                print(f"Ошибка при добавлении продавца: {e}")
 
     def update_salesman(self, salesman_id, name, email, phone):
         """Обновление данных продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute('''
-                UPDATE Salesmen SET name = ?, email = ?, phone = ? 
-                WHERE salesman_id = ?
-            ''', (name, email, phone, salesman_id))
+            try:
+                cursor.execute('''
+                    UPDATE Salesmen SET name = ?, email = ?, phone = ? 
+                    WHERE salesman_id = ?
+                ''', (name, email, phone, salesman_id))
 
-            if cursor.rowcount > 0:
-                print("Данные продавца успешно обновлены!")
-            else:
-                print("Продавец с указанным ID не найден")
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при обновлении продавца: {e}")
-        finally:
-            conn.close()
+                if cursor.rowcount > 0:
+                    print("Данные продавца успешно обновлены!")
+                else:
+                    print("Продавец с указанным ID не найден")
+                conn.commit()
+                self.invalidate_cache('Salesmen')
+            except sqlite3.Error as e:
+                print(f"Ошибка при обновлении продавца: {e}")
 
     def delete_salesman(self, salesman_id):
         """Удаление продавца"""
-        conn = self.connect()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            # Проверяем, есть ли связанные продажи
-            cursor.execute('SELECT COUNT(*) FROM Sales WHERE salesman_id = ?', (salesman_id,))
-            if cursor.fetchone()[0] > 0:
-                print("Невозможно удалить продавца, у которого есть связанные продажи")
-                return
+            try:
+                # Проверяем, есть ли связанные продажи
+                cursor.execute('SELECT COUNT(*) FROM Sales WHERE salesman_id = ?', (salesman_id,))
+                if cursor.fetchone()[0] > 0:
+                    print("Невозможно удалить продавца, у которого есть связанные продажи")
+                    return
 
-            cursor.execute('DELETE FROM Salesmen WHERE salesman_id = ?', (salesman_id,))
+                cursor.execute('DELETE FROM Salesmen WHERE salesman_id = ?', (salesman_id,))
 
-            if cursor.rowcount > 0:
-                print("Продавец успешно удален!")
-            else:
-                print("Продавец с указанным ID не найден")
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при удалении продавца: {e}")
-        finally:
-            conn.close()
+                if cursor.rowcount > 0:
+                    print("Продавец успешно удален!")
+                else:
+                    print("Продавец с указанным ID не найден")
+                conn.commit()
+                self.invalidate_cache('Salesmen')
+            except sqlite3.Error as e:
+                print(f"Ошибка при удалении продавца: {e}")
 
     def insert_customer(self, name, email, phone):
         """Добавление нового покупателя"""
-        conn = self.connect()
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute('''
-                INSERT INTO Customers (name, email, phone)
-                VALUES (?, ?, ?)
-            ''', (name, email, phone))
-            conn.commit()
-            print("Покупатель успешно добавлен!")
-        except sqlite3.Error as e:
-            print(f"Ошибка при добавлении покупателя: {e}")
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute('''
+                    INSERT INTO Customers (name, email, phone)
+                    VALUES (?, ?, ?)
+                ''', (name, email, phone))
+                conn.commit()
+                self.invalidate_cache('Customers')
+                print("Покупатель успешно добавлен!")
+            except sqlite3.Error as e:
+                print(f"Ошибка при добавлении покупателя: {e}")
 
     def update_customer(self, customer_id, name, email, phone):
         """Обновление данных покупателя"""
-        conn = self.connect()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute('''
-                UPDATE Customers SET name = ?, email = ?, phone = ? 
-                WHERE customer_id = ?
-            ''', (name, email, phone, customer_id))
+            try:
+                cursor.execute('''
+                    UPDATE Customers SET name = ?, email = ?, phone = ? 
+                    WHERE customer_id = ?
+                ''', (name, email, phone, customer_id))
 
-            if cursor.rowcount > 0:
-                print("Данные покупателя успешно обновлены!")
-            else:
-                print("Покупатель с указанным ID не найден")
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при обновлении покупателя: {e}")
-        finally:
-            conn.close()
+                if cursor.rowcount > 0:
+                    print("Данные покупателя успешно обновлены!")
+                else:
+                    print("Покупатель с указанным ID не найден")
+                conn.commit()
+                self.invalidate_cache('Customers')
+            except sqlite3.Error as e:
+                print(f"Ошибка при обновлении покупателя: {e}")
 
     def delete_customer(self, customer_id):
         """Удаление покупателя"""
-        conn = self.connect()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            # Проверяем, есть ли связанные продажи
-            cursor.execute('SELECT COUNT(*) FROM Sales WHERE customer_id = ?', (customer_id,))
-            if cursor.fetchone()[0] > 0:
-                print("Невозможно удалить покупателя, у которого есть связанные продажи")
-                return
+            try:
+                # Проверяем, есть ли связанные продажи
+                cursor.execute('SELECT COUNT(*) FROM Sales WHERE customer_id = ?', (customer_id,))
+                if cursor.fetchone()[0] > 0:
+                    print("Невозможно удалить покупателя, у которого есть связанные продажи")
+                    return
 
-            cursor.execute('DELETE FROM Customers WHERE customer_id = ?', (customer_id,))
+                cursor.execute('DELETE FROM Customers WHERE customer_id = ?', (customer_id,))
 
-            if cursor.rowcount > 0:
-                print("Покупатель успешно удален!")
+                if cursor.rowcount > 0:
+                    print("Покупатель успешно удален!")
+                else:
+                    print("Покупатель с указанным ID не найден")
+                conn.commit()
+                self.invalidate_cache('Customers')
+            except sqlite3.Error as e:
+                print(f"Ошибка при удалении покупателя: {e}")
+
+    # Пакетные операции: все изменения одной транзакцией, результат по каждому ID
+    def existing_ids(self, conn, table, key, ids):
+        """Какие из ids есть в таблице: один запрос на весь список"""
+        cursor = conn.execute(
+            f"SELECT {key} FROM {table} WHERE {key} IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+        return {row[0] for row in cursor}
+
+    def update_sales(self, updates):
+        """Обновление сумм продаж по списку пар (sale_id, amount)"""
+        updates = {int(sale_id): amount for sale_id, amount in updates}
+        with self.connection() as conn:
+            try:
+                found = self.existing_ids(conn, 'Sales', 'sale_id', list(updates))
+                conn.executemany(
+                    "UPDATE Sales SET amount = ? WHERE sale_id = ?",
+                    ((amount, sale_id) for sale_id, amount in updates.items() if sale_id in found)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"Ошибка при обновлении продаж: {e}")
+                return dict.fromkeys(updates, BATCH_ERROR)
+
+        self.invalidate_cache('Sales')
+        outcomes = {sale_id: BATCH_UPDATED if sale_id in found else BATCH_NOT_FOUND for sale_id in updates}
+        print(f"Обновлено продаж: {len(found)} из {len(updates)}")
+        return outcomes
+
+    def delete_sales(self, sale_ids):
+        """Удаление продаж по списку ID"""
+        ids = unique_ids(sale_ids)
+        with self.connection() as conn:
+            try:
+                found = self.existing_ids(conn, 'Sales', 'sale_id', ids)
+                conn.execute("DELETE FROM Sales WHERE sale_id IN (SELECT value FROM json_each(?))",
+                             (json.dumps(ids),))
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"Ошибка при удалении продаж: {e}")
+                return dict.fromkeys(ids, BATCH_ERROR)
+
+        self.invalidate_cache('Sales')
+        outcomes = {sale_id: BATCH_DELETED if sale_id in found else BATCH_NOT_FOUND for sale_id in ids}
+        print(f"Удалено продаж: {len(found)} из {len(outcomes)}")
+        return outcomes
+
+    def delete_people(self, table, key, ids):
+        """Удаление продавцов или покупателей, у которых нет продаж.
+
+        Наличие продаж проверяется одним запросом по индексу Sales для всего
+        списка, удаляются только записи без связанных продаж.
+        """
+        ids = unique_ids(ids)
+        with self.connection() as conn:
+            try:
+                found = self.existing_ids(conn, table, key, ids)
+                referenced = {row[0] for row in conn.execute(
+                    f"SELECT DISTINCT {key} FROM Sales WHERE {key} IN (SELECT value FROM json_each(?))",
+                    (json.dumps(ids),))}
+                conn.execute(
+                    f"DELETE FROM {table} WHERE {key} IN (SELECT value FROM json_each(?))",
+                    (json.dumps(sorted(found - referenced)),)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"Ошибка при удалении: {e}")
+                return dict.fromkeys(ids, BATCH_ERROR)
+
+        self.invalidate_cache(table)
+        outcomes = {}
+        for person_id in ids:
+            if person_id not in found:
+                outcomes[person_id] = BATCH_NOT_FOUND
+            elif person_id in referenced:
+                outcomes[person_id] = BATCH_HAS_SALES
             else:
-                print("Покупатель с указанным ID не найден")
-            conn.commit()
-        except sqlite3.Error as e:
-            print(f"Ошибка при удалении покупателя: {e}")
-        finally:
-            conn.close()
-
-    # Метод для сохранения результатов (Задание 3)
-    def save_results_to_file(self, results, filename=None):
-        """Сохранение результатов в файл"""
-        if filename is None:
+                outcomes[person_id] = BATCH_DELETED
+        return outcomes
+
+    def delete_salesmen(self, salesman_ids):
+        """Удаление продавцов по списку ID"""
+        outcomes = self.delete_people('Salesmen', 'salesman_id', salesman_ids)
+        self.print_delete_outcomes(outcomes, "продавцов")
+        return outcomes
+
+    def delete_customers(self, customer_ids):
+        """Удаление покупателей по списку ID"""
+        outcomes = self.delete_people('Customers', 'customer_id', customer_ids)
+        self.print_delete_outcomes(outcomes, "покупателей")
+        return outcomes
+
+    @staticmethod
+    def print_delete_outcomes(outcomes, label):
+        results = list(outcomes.values())
+        if BATCH_ERROR in results:
+            return
+        print(f"Удалено {label}: {results.count(BATCH_DELETED)} из {len(results)}")
+        blocked = [str(i) for i, result in outcomes.items() if result == BATCH_HAS_SALES]
+        missing = [str(i) for i, result in outcomes.items() if result == BATCH_NOT_FOUND]
+        if blocked:
+            print(f"Не удалены (есть связанные продажи): {', '.join(blocked)}")
+        if missing:
+            print(f"Не найдены: {', '.join(missing)}")
+
+    # Методы для сохранения результатов (Задание 3)
+    def export_path_for(self, filename, fmt, compress):
+        """Путь выгрузки: указанный файл или путь из настроек"""
+        if not filename:
             filename = self.export_path
+        if compress and fmt != 'parquet' and not filename.endswith('.gz'):
+            filename += '.gz'
+        return filename
+
+    def export_report(self, report, params=(), filename=None, fmt='csv', compress=False):
+        """Выгрузка отчета в файл напрямую из курсора, без загрузки в память"""
+        filename = self.export_path_for(filename, fmt, compress)
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.execute(REPORT_QUERIES[report], params)
+                columns = [column[0] for column in cursor.description]
+                count = write_export(filename, columns, iter_batches(cursor), fmt, compress)
+            print(f"Результаты успешно сохранены в файл: {filename} (строк: {count})")
+            return count
+        except (OSError, ValueError, RuntimeError, sqlite3.Error) as e:
+            print(f"Ошибка при сохранении в файл: {e}")
+
+    def save_results_to_file(self, results, filename=None, fmt='csv', compress=False,
+                             columns=('sale_id', 'salesman', 'customer', 'amount', 'sale_date')):
+        """Сохранение уже полученных результатов в файл"""
+        filename = self.export_path_for(filename, fmt, compress)
+        columns = list(columns)
 
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                for row in results:
-                    f.write(str(row) + '\n')
-            print(f"Результаты успешно сохранены в файл: {filename}")
-        except Exception as e:
+            count = write_export(filename, columns, batches_of(results), fmt, compress)
+            print(f"Результаты успешно сохранены в файл: {filename} (строк: {count})")
+            return count
+        except (OSError, ValueError, RuntimeError) as e:
             print(f"Ошибка при сохранении в файл: {e}")
 
     def set_export_path(self, path):
@@ -604,28 +1277,36 @@ class SalesDB:
         self.export_path = path
         print(f"Путь для сохранения установлен: {path}")
 
+    def set_page_size(self, page_size):
+        """Установка размера страницы при постраничном просмотре"""
+        if page_size < 1:
+            print("Размер страницы должен быть положительным числом")
+            return
+        self.page_size = page_size
+        print(f"Размер страницы установлен: {page_size}")
+
     def display_salesmen(self):
         """Отображение списка продавцов"""
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT salesman_id, name, email, phone FROM Salesmen")
-        results = cursor.fetchall()
-        print("\n=== СПИСОК ПРОДАВЦОВ ===")
-        for row in results:
-            print(f"ID: {row[0]}, Имя: {row[1]}, Email: {row[2]}, Телефон: {row[3]}")
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT salesman_id, name, email, phone FROM Salesmen")
+            results = cursor.fetchall()
+            print("\n=== СПИСОК ПРОДАВЦОВ ===")
+            for row in results:
+                print(f"ID: {row[0]}, Имя: {row[1]}, Email: {row[2]}, Телефон: {row[3]}")
+
         return results
 
     def display_customers(self):
         """Отображение списка покупателей"""
-        conn = self.connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT customer_id, name, email, phone FROM Customers")
-        results = cursor.fetchall()
-        print("\n=== СПИСОК ПОКУПАТЕЛЕЙ ===")
-        for row in results:
-            print(f"ID: {row[0]}, Имя: {row[1]}, Email: {row[2]}, Телефон: {row[3]}")
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT customer_id, name, email, phone FROM Customers")
+            results = cursor.fetchall()
+            print("\n=== СПИСОК ПОКУПАТЕЛЕЙ ===")
+            for row in results:
+                print(f"ID: {row[0]}, Имя: {row[1]}, Email: {row[2]}, Телефон: {row[3]}")
+
         return results
 
 
@@ -651,6 +1332,7 @@ def main():
         elif choice == '3':
             settings_menu(db)
         elif choice == '0':
+            db.close()
             print("До свидания!")
             break
         else:
@@ -659,6 +1341,9 @@ def main():
 
 def reports_menu(db):
     """Меню отчетов"""
+    # Последний выполненный отчет: (имя запроса, параметры) для сохранения в файл
+    last_report = None
+
     while True:
         print("\n" + "-" * 30)
         print("ОТЧЕТЫ")
@@ -680,48 +1365,60 @@ def reports_menu(db):
         print("0. Назад")
 
         choice = input("Выберите отчет: ")
-        results = []
 
         if choice == '1':
-            results = db.display_all_sales()
+            browse_all_sales(db)
+            last_report = ('all_sales', ())
         elif choice == '2':
             salesman_id = int(input("Введите ID продавца: "))
-            results = db.display_salesman_sales(salesman_id)
+            db.display_salesman_sales(salesman_id)
+            last_report = ('salesman_sales', (salesman_id,))
         elif choice == '3':
-            results = db.display_max_sale()
+            db.display_max_sale()
+            last_report = ('max_sale', ())
         elif choice == '4':
-            results = db.display_min_sale()
+            db.display_min_sale()
+            last_report = ('min_sale', ())
         elif choice == '5':
             salesman_id = int(input("Введите ID продавца: "))
-            results = db.display_salesman_max_sale(salesman_id)
+            db.display_salesman_max_sale(salesman_id)
+            last_report = ('salesman_max_sale', (salesman_id,))
         elif choice == '6':
             salesman_id = int(input("Введите ID продавца: "))
-            results = db.display_salesman_min_sale(salesman_id)
+            db.display_salesman_min_sale(salesman_id)
+            last_report = ('salesman_min_sale', (salesman_id,))
         elif choice == '7':
             customer_id = int(input("Введите ID покупателя: "))
-            results = db.display_customer_max_sale(customer_id)
+            db.display_customer_max_sale(customer_id)
+            last_report = ('customer_max_sale', (customer_id,))
         elif choice == '8':
             customer_id = int(input("Введите ID покупателя: "))
-            results = db.display_customer_min_sale(customer_id)
+            db.display_customer_min_sale(customer_id)
+            last_report = ('customer_min_sale', (customer_id,))
         elif choice == '9':
-            results = db.display_top_salesman()
+            db.display_top_salesman()
+            last_report = ('top_salesman', ())
         elif choice == '10':
-            results = db.display_bottom_salesman()
+            db.display_bottom_salesman()
+            last_report = ('bottom_salesman', ())
         elif choice == '11':
-            results = db.display_top_customer()
+            db.display_top_customer()
+            last_report = ('top_customer', ())
         elif choice == '12':
             customer_id = int(input("Введите ID покупателя: "))
-            results = db.display_avg_customer_purchase(customer_id)
+            db.display_avg_customer_purchase(customer_id)
+            last_report = ('avg_customer_purchase', (customer_id,))
         elif choice == '13':
             salesman_id = int(input("Введите ID продавца: "))
-            results = db.display_avg_salesman_sale(salesman_id)
+            db.display_avg_salesman_sale(salesman_id)
+            last_report = ('avg_salesman_sale', (salesman_id,))
         elif choice == '14':
-            if results:
+            if last_report:
+                fmt = input(f"Формат файла ({', '.join(EXPORT_FORMATS)}, Enter - csv): ") or 'csv'
+                compress = input("Сжать файл gzip? (y/n): ") == 'y'
                 filename = input("Введите имя файла (или нажмите Enter для использования настроек): ")
-                if filename:
-                    db.save_results_to_file(results, filename)
-                else:
-                    db.save_results_to_file(results)
+                report, params = last_report
+                db.export_report(report, params, filename or None, fmt, compress)
             else:
                 print("Сначала выполните какой-либо отчет!")
         elif choice == '0':
@@ -730,6 +1427,45 @@ def reports_menu(db):
             print("Неверный выбор!")
 
 
+def print_sales_page(page, title="ВСЕ СДЕЛКИ"):
+    """Вывод одной страницы списка сделок"""
+    print(f"\n=== {title} ===")
+    if not page:
+        print("Сделок нет")
+    for row in page:
+        print(f"ID: {row[0]}, Продавец: {row[1]}, Покупатель: {row[2]}, Сумма: {row[3]:.2f}, Дата: {row[4]}")
+
+
+def browse_all_sales(db):
+    """Постраничный просмотр всех сделок"""
+    page = db.fetch_sales_page()
+    page_number = 1
+
+    while True:
+        print_sales_page(page, f"ВСЕ СДЕЛКИ (страница {page_number})")
+
+        choice = input("n - следующая страница, p - предыдущая, 0 - назад: ")
+
+        if choice == 'n':
+            next_page = db.fetch_sales_page((page[-1][4], page[-1][0])) if page else []
+            if next_page:
+                page = next_page
+                page_number += 1
+            else:
+                print("Это последняя страница")
+        elif choice == 'p':
+            prev_page = db.fetch_sales_page((page[0][4], page[0][0]), backward=True) if page else []
+            if prev_page:
+                page = prev_page
+                page_number -= 1
+            else:
+                print("Это первая страница")
+        elif choice == '0':
+            break
+        else:
+            print("Неверный выбор!")
+
+
 def data_management_menu(db):
     """Меню управления данными"""
     while True:
@@ -763,12 +1499,13 @@ def sales_management(db):
         print("2. Добавить продажу")
         print("3. Обновить продажу")
         print("4. Удалить продажу")
+        print("5. Удалить несколько продаж")
         print("0. Назад")
 
         choice = input("Выберите действие: ")
 
         if choice == '1':
-            db.display_all_sales()
+            browse_all_sales(db)
         elif choice == '2':
             db.display_salesmen()
             salesman_id = int(input("Введите ID продавца: "))
@@ -777,14 +1514,18 @@ def sales_management(db):
             amount = float(input("Введите сумму продажи: "))
             db.insert_sale(salesman_id, customer_id, amount)
         elif choice == '3':
-            db.display_all_sales()
+            print_sales_page(db.fetch_sales_page(), "ПОСЛЕДНИЕ СДЕЛКИ")
             sale_id = int(input("Введите ID продажи для обновления: "))
             amount = float(input("Введите новую сумму: "))
             db.update_sale(sale_id, amount)
         elif choice == '4':
-            db.display_all_sales()
+            print_sales_page(db.fetch_sales_page(), "ПОСЛЕДНИЕ СДЕЛКИ")
             sale_id = int(input("Введите ID продажи для удаления: "))
             db.delete_sale(sale_id)
+        elif choice == '5':
+            print_sales_page(db.fetch_sales_page(), "ПОСЛЕДНИЕ СДЕЛКИ")
+            sale_ids = parse_ids(input("Введите ID продаж для удаления через запятую: "))
+            db.delete_sales(sale_ids)
         elif choice == '0':
             break
         else:
@@ -799,6 +1540,7 @@ def salesmen_management(db):
         print("2. Добавить продавца")
         print("3. Обновить продавца")
         print("4. Удалить продавца")
+        print("5. Удалить нескольких продавцов")
         print("0. Назад")
 
         choice = input("Выберите действие: ")
@@ -821,6 +1563,10 @@ def salesmen_management(db):
             db.display_salesmen()
             salesman_id = int(input("Введите ID продавца для удаления: "))
             db.delete_salesman(salesman_id)
+        elif choice == '5':
+            db.display_salesmen()
+            salesman_ids = parse_ids(input("Введите ID продавцов для удаления через запятую: "))
+            db.delete_salesmen(salesman_ids)
         elif choice == '0':
             break
         else:
@@ -835,6 +1581,7 @@ def customers_management(db):
         print("2. Добавить покупателя")
         print("3. Обновить покупателя")
         print("4. Удалить покупателя")
+        print("5. Удалить нескольких покупателей")
         print("0. Назад")
 
         choice = input("Выберите действие: ")
@@ -857,6 +1604,10 @@ def customers_management(db):
             db.display_customers()
             customer_id = int(input("Введите ID покупателя для удаления: "))
             db.delete_customer(customer_id)
+        elif choice == '5':
+            db.display_customers()
+            customer_ids = parse_ids(input("Введите ID покупателей для удаления через запятую: "))
+            db.delete_customers(customer_ids)
         elif choice == '0':
             break
         else:
@@ -868,6 +1619,7 @@ def settings_menu(db):
     while True:
         print("\n--- НАСТРОЙКИ ---")
         print("1. Установить путь для сохранения файлов")
+        print("2. Установить размер страницы")
         print("0. Назад")
 
         choice = input("Выберите действие: ")
@@ -875,6 +1627,9 @@ def settings_menu(db):
         if choice == '1':
             path = input("Введите путь для сохранения файлов: ")
             db.set_export_path(path)
+        elif choice == '2':
+            page_size = int(input("Введите число сделок на странице: "))
+            db.set_page_size(page_size)
         elif choice == '0':
             break
         else:
@@ -0,0 +1,157 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sales_app import SalesDB
+
+
+class ReportJob:
+    """Выполняющийся отчет: соединение, на котором он идет, и признак отмены"""
+
+    def __init__(self):
+        self.conn = None
+        self.cancelled = False
+
+
+class AsyncSalesService:
+    """Асинхронный доступ к отчетам SalesDB.
+
+    Запросы выполняются в пуле рабочих потоков, каждый на своем соединении
+    из пула SalesDB, поэтому цикл событий не блокируется и несколько отчетов
+    идут одновременно. При отмене задачи или истечении таймаута выполняемый
+    запрос прерывается через sqlite3.Connection.interrupt().
+    """
+
+    def __init__(self, db, max_workers=4, timeout=30.0):
+        if db.pool is None:
+            raise ValueError("Для асинхронных отчетов нужен пул соединений (pool_size > 0)")
+        self.db = db
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sales-report')
+        self._lock = threading.Lock()
+        self._jobs = set()
+
+    def _execute(self, job, func, args):
+        """Выполнение отчета в рабочем потоке"""
+        with self.db.connection() as conn:
+            with self._lock:
+                if job.cancelled:
+                    raise sqlite3.OperationalError("interrupted")
+                job.conn = conn
+            try:
+                # Вложенные вызовы self.db.connection() в этом потоке получат то же соединение
+                return func(*args)
+            finally:
+                with self._lock:
+                    job.conn = None
+
+    def _cancel(self, job):
+        with self._lock:
+            job.cancelled = True
+            if job.conn is not None:
+                job.conn.interrupt()
+
+    async def run(self, func, *args, timeout=None):
+        """Выполнение func(*args) в пуле потоков с таймаутом и отменой"""
+        loop = asyncio.get_running_loop()
+        job = ReportJob()
+        with self._lock:
+            self._jobs.add(job)
+        future = loop.run_in_executor(self.executor, self._execute, job, func, args)
+
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._cancel(job)
+            raise
+        finally:
+            with self._lock:
+                self._jobs.discard(job)
+
+    async def report(self, name, params=(), one=False, timeout=None):
+        """Запрос из реестра SalesDB по имени"""
+        return await self.run(self.db.query, name, params, one, timeout=timeout)
+
+    # Отчеты (Задание 1)
+    async def all_sales(self, key=None, backward=False, page_size=None, timeout=None):
+        return await self.run(self.db.fetch_sales_page, key, backward, page_size, timeout=timeout)
+
+    async def salesman_sales(self, salesman_id, timeout=None):
+        return await self.report('salesman_sales', (salesman_id,), timeout=timeout)
+
+    async def max_sale(self, timeout=None):
+        return await self.report('max_sale', one=True, timeout=timeout)
+
+    async def min_sale(self, timeout=None):
+        return await self.report('min_sale', one=True, timeout=timeout)
+
+    async def salesman_max_sale(self, salesman_id, timeout=None):
+        return await self.report('salesman_max_sale', (salesman_id,), one=True, timeout=timeout)
+
+    async def salesman_min_sale(self, salesman_id, timeout=None):
+        return await self.report('salesman_min_sale', (salesman_id,), one=True, timeout=timeout)
+
+    async def customer_max_sale(self, customer_id, timeout=None):
+        return await self.report('customer_max_sale', (customer_id,), one=True, timeout=timeout)
+
+    async def customer_min_sale(self, customer_id, timeout=None):
+        return await self.report('customer_min_sale', (customer_id,), one=True, timeout=timeout)
+
+    async def top_salesman(self, timeout=None):
+        return await self.report('top_salesman', one=True, timeout=timeout)
+
+    async def bottom_salesman(self, timeout=None):
+        return await self.report('bottom_salesman', one=True, timeout=timeout)
+
+    async def top_customer(self, timeout=None):
+        return await self.report('top_customer', one=True, timeout=timeout)
+
+    async def avg_customer_purchase(self, customer_id, timeout=None):
+        return await self.report('avg_customer_purchase', (customer_id,), one=True, timeout=timeout)
+
+    async def avg_salesman_sale(self, salesman_id, timeout=None):
+        return await self.report('avg_salesman_sale', (salesman_id,), one=True, timeout=timeout)
+
+    def cancel_all(self):
+        """Прерывание всех выполняющихся отчетов"""
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            self._cancel(job)
+
+    def close(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def demo(db_name='sales.db'):
+    """Одновременное выполнение нескольких отчетов"""
+    db = SalesDB(db_name)
+    db.initialize_database()
+
+    async with AsyncSalesService(db) as service:
+        top, bottom, customer, page = await asyncio.gather(
+            service.top_salesman(),
+            service.bottom_salesman(),
+            service.top_customer(),
+            service.all_sales(page_size=5),
+        )
+        print(f"Продавец с максимальной суммой продаж: {top}")
+        print(f"Продавец с минимальной суммой продаж: {bottom}")
+        print(f"Покупатель с максимальной суммой покупок: {customer}")
+        print("Последние сделки:")
+        for row in page:
+            print(f"  ID: {row[0]}, Продавец: {row[1]}, Покупатель: {row[2]}, Сумма: {row[3]:.2f}, Дата: {row[4]}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(demo())
@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from sales_app import SalesDB
+from bulk_import import drop_deferred_structures, restore_deferred_structures
+
+
+GENERATE_CHUNK_SIZE = 100000
+DATE_RANGE_DAYS = 3 * 365
+# Сколько строк списка всех сделок читает замер all_sales_stream: полный список
+# на больших базах занял бы больше времени, чем все остальные отчеты вместе
+STREAM_BENCH_ROWS = 10000
+
+
+def zipf_cum_weights(n, skew):
+    """Накопленные веса распределения Ципфа для ID 1..n (skew=0 - равномерное)"""
+    return list(itertools.accumulate(1.0 / rank ** skew for rank in range(1, n + 1)))
+
+
+def generate_dataset(db, sales=10000, salesmen=100, customers=1000, skew=1.1, seed=42,
+                     chunk_size=GENERATE_CHUNK_SIZE):
+    """Генерация синтетических продаж.
+
+    Продавцы и покупатели выбираются по закону Ципфа с параметром skew:
+    небольшая доля продавцов и покупателей дает основную часть сделок.
+    Индексы и итоги строятся один раз после загрузки.
+    """
+    rnd = random.Random(seed)
+    first_date = date.today() - timedelta(days=DATE_RANGE_DAYS)
+
+    with db.connection() as conn:
+        base_salesman = conn.execute("SELECT COALESCE(MAX(salesman_id), 0) FROM Salesmen").fetchone()[0]
+        base_customer = conn.execute("SELECT COALESCE(MAX(customer_id), 0) FROM Customers").fetchone()[0]
+
+        conn.executemany(
+            "INSERT INTO Salesmen (name, email, phone) VALUES (?, ?, ?)",
+            ((f"Продавец {i}", f"salesman{i}@mail.com", f"+7900{i:07d}") for i in range(1, salesmen + 1))
+        )
+        conn.executemany(
+            "INSERT INTO Customers (name, email, phone) VALUES (?, ?, ?)",
+            ((f"Покупатель {i}", f"customer{i}@mail.com", f"+7901{i:07d}") for i in range(1, customers + 1))
+        )
+        conn.commit()
+
+        salesman_ids = range(base_salesman + 1, base_salesman + salesmen + 1)
+        customer_ids = range(base_customer + 1, base_customer + customers + 1)
+        salesman_weights = zipf_cum_weights(salesmen, skew)
+        customer_weights = zipf_cum_weights(customers, skew)
+
+        try:
+            drop_deferred_structures(conn)
+            remaining = sales
+            while remaining > 0:
+                size = min(chunk_size, remaining)
+                chunk = zip(
+                    rnd.choices(salesman_ids, cum_weights=salesman_weights, k=size),
+                    rnd.choices(customer_ids, cum_weights=customer_weights, k=size),
+                    (round(rnd.lognormvariate(9, 1), 2) for _ in range(size)),
+                    ((first_date + timedelta(days=rnd.randrange(DATE_RANGE_DAYS))).isoformat() for _ in range(size)),
+                )
+                conn.executemany(
+                    "INSERT INTO Sales (salesman_id, customer_id, amount, sale_date) VALUES (?, ?, ?, ?)",
+                    chunk
+                )
+                conn.commit()
+                remaining -= size
+        finally:
+            # Пачки фиксируются по отдельности, поэтому индексы и итоги возвращаются и после
+            # ошибки или Ctrl-C: иначе отчеты по итогам продолжали бы читать устаревшие данные
+            if conn.in_transaction:
+                conn.rollback()
+            restore_deferred_structures(db, conn)
+            conn.commit()
+        conn.execute("ANALYZE")
+
+    db.invalidate_cache('Sales', 'Salesmen', 'Customers')
+
+    return list(salesman_ids), list(customer_ids)
+
+
+def report_cases(db, salesman_ids, customer_ids, rnd):
+    """Все отчеты sales_app.py: имя -> функция без аргументов"""
+    def salesman():
+        return rnd.choice(salesman_ids)
+
+    def customer():
+        return rnd.choice(customer_ids)
+
+    return {
+        'all_sales_stream': lambda: sum(1 for _ in itertools.islice(db.stream_all_sales(), STREAM_BENCH_ROWS)),
+        'all_sales_page': db.fetch_sales_page,
+        'salesman_sales': lambda: db.display_salesman_sales(salesman()),
+        'max_sale': db.display_max_sale,
+        'min_sale': db.display_min_sale,
+        'salesman_max_sale': lambda: db.display_salesman_max_sale(salesman()),
+        'salesman_min_sale': lambda: db.display_salesman_min_sale(salesman()),
+        'customer_max_sale': lambda: db.display_customer_max_sale(customer()),
+        'customer_min_sale': lambda: db.display_customer_min_sale(customer()),
+        'top_salesman': db.display_top_salesman,
+        'bottom_salesman': db.display_bottom_salesman,
+        'top_customer': db.display_top_customer,
+        'avg_customer_purchase': lambda: db.display_avg_customer_purchase(customer()),
+        'avg_salesman_sale': lambda: db.display_avg_salesman_sale(salesman()),
+    }
+
+
+def percentile(sorted_values, p):
+    """Процентиль методом ближайшего ранга"""
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_kb():
+    """Пиковый объем резидентной памяти процесса за все время работы в КБ (None, если недоступно)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def peak_alloc_kb(case):
+    """Пик памяти объектов Python за один вызов case в КБ (по tracemalloc, без памяти самой SQLite)"""
+    tracemalloc.start()
+    try:
+        case()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(db, cases, repeat=50, warmup=3):
+    """Замер задержек каждого отчета, вывод отчетов подавляется"""
+    results = {}
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        for name, case in cases.items():
+            for _ in range(warmup):
+                case()
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                case()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+
+            results[name] = {
+                'runs': repeat,
+                'mean_ms': sum(timings) / len(timings),
+                'p50_ms': percentile(timings, 50),
+                'p95_ms': percentile(timings, 95),
+                'p99_ms': percentile(timings, 99),
+                # Отдельный вызов: tracemalloc замедляет выполнение и исказил бы задержки
+                'peak_alloc_kb': peak_alloc_kb(case),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк отчетов базы 'Продажи'")
+    parser.add_argument('--db', default='bench_sales.db', help="файл базы данных для бенчмарка")
+    parser.add_argument('--reuse', action='store_true', help="использовать уже сгенерированную базу")
+    parser.add_argument('--sales', type=int, default=10000, help="число продаж (10k - 100M)")
+    parser.add_argument('--salesmen', type=int, default=100)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--skew', type=float, default=1.1, help="параметр распределения Ципфа (0 - равномерное)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=50, help="число замеров на отчет")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help="размер кэша результатов (по умолчанию кэш отключен, замеряются запросы)")
+    parser.add_argument('--reports', nargs='*', help="замерять только указанные отчеты")
+    parser.add_argument('--output', default='bench_results.json', help="файл для результатов в формате JSON")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db) and not args.reuse:
+        print(f"Файл {args.db} уже существует: удалите его или укажите --reuse")
+        return
+
+    db = SalesDB(args.db, cache_size=args.cache_size)
+    db.initialize_database()
+    generation_seconds = None
+
+    try:
+        if args.reuse:
+            with db.connection() as conn:
+                salesman_ids = [row[0] for row in conn.execute("SELECT salesman_id FROM Salesmen")]
+                customer_ids = [row[0] for row in conn.execute("SELECT customer_id FROM Customers")]
+        else:
+            start = time.perf_counter()
+            salesman_ids, customer_ids = generate_dataset(
+                db, args.sales, args.salesmen, args.customers, args.skew, args.seed)
+            generation_seconds = time.perf_counter() - start
+            print(f"Сгенерировано продаж: {args.sales} за {generation_seconds:.1f} с")
+
+        with db.connection() as conn:
+            sales_count = conn.execute("SELECT COUNT(*) FROM Sales").fetchone()[0]
+
+        cases = report_cases(db, salesman_ids, customer_ids, random.Random(args.seed))
+        if args.reports:
+            cases = {name: cases[name] for name in args.reports}
+        results = run_benchmark(db, cases, args.repeat)
+    finally:
+        db.close()
+
+    output = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'dataset': {
+            'sales': sales_count,
+            'salesmen': len(salesman_ids),
+            'customers': len(customer_ids),
+            'skew': args.skew,
+            'seed': args.seed,
+            'generation_seconds': generation_seconds,
+        },
+        'cache_size': args.cache_size,
+        'reports': results,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+
+    print(f"{'Отчет':<24}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    print(f"Результаты сохранены в файл: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
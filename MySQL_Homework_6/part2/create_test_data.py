@@ -1,109 +1,268 @@
+import argparse
+import itertools
+import random
 import sqlite3
+import time
+from datetime import date, timedelta
 
+from hospital_app import (DB_NAME, create_schema, create_report_indexes, drop_report_indexes,
+                          create_donation_rollup, rebuild_donation_rollup, create_donation_rollup_triggers,
+                          drop_donation_rollup_triggers, create_payroll_summary, rebuild_payroll_summary,
+                          create_payroll_summary_triggers, drop_payroll_summary_triggers)
 
-def create_test_data():
-    """Создание тестовых данных для демонстрации работы приложения"""
-    conn = sqlite3.connect('hospital.db')
-    cursor = conn.cursor()
+
+INSERT_CHUNK_SIZE = 50000
+
+# Справочники для генерации: отделение -> (специализация, диагнозы)
+DEPARTMENT_PROFILES = {
+    'Педиатрическое отделение': ('Педиатр', ('ОРЗ', 'Ангина', 'Бронхит', 'Ветряная оспа')),
+    'Травматологическое отделение': ('Травматолог', ('Вывих плеча', 'Перелом руки', 'Растяжение связок', 'Ушиб')),
+    'Эндокринологическое отделение': ('Эндокринолог', ('Сахарный диабет', 'Гипотиреоз', 'Ожирение')),
+    'Офтальмологическое отделение': ('Офтальмолог', ('Близорукость', 'Катаракта', 'Конъюнктивит')),
+    'Кардиологическое отделение': ('Кардиолог', ('Гипертония', 'Аритмия', 'Стенокардия')),
+    'Неврологическое отделение': ('Невролог', ('Мигрень', 'Остеохондроз', 'Невралгия')),
+    'Хирургическое отделение': ('Хирург', ('Аппендицит', 'Грыжа', 'Желчнокаменная болезнь')),
+    'Терапевтическое отделение': ('Терапевт', ('ОРВИ', 'Гастрит', 'Пневмония')),
+}
+FIRST_NAMES = ('Антон', 'Ирина', 'Максим', 'Светлана', 'Павел', 'Юлия', 'Дмитрий', 'Анна', 'Сергей', 'Ольга',
+               'Николай', 'Елена', 'Алексей', 'Мария', 'Игорь', 'Татьяна')
+LAST_NAMES = ('Мельников', 'Белов', 'Егоров', 'Романов', 'Дорохов', 'Никитин', 'Громов', 'Лебедев', 'Фёдоров',
+              'Соколов', 'Тарасов', 'Морозов', 'Ковалёв', 'Орлов', 'Андреев', 'Волков')
+COMPANY_WORDS = ('Health', 'Med', 'Life', 'Care', 'Pharm', 'Bio', 'Vita', 'Clinic')
+COMPANY_SUFFIXES = ('Plus', 'Invest', 'Group', 'Lab', 'Line', 'Pro')
+
+
+def last_name(base, female):
+    """Фамилия в женском роде для женских имен"""
+    return base + 'а' if female else base
+
+
+def person(rnd):
+    """Случайные имя и фамилия"""
+    first = rnd.choice(FIRST_NAMES)
+    female = first.endswith(('а', 'я'))
+    return first, last_name(rnd.choice(LAST_NAMES), female)
+
+
+def chunks(rows, size):
+    """Разбиение генератора строк на списки по size"""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def date_weights(first_date, days, weekdays_only=False):
+    """Накопленные веса дат: больше пожертвований в конце месяца и в декабре"""
+    weights = []
+    for offset in range(days):
+        day = first_date + timedelta(days=offset)
+        if weekdays_only:
+            weight = 0.0 if day.weekday() >= 5 else 1.0
+        else:
+            weight = 1.0
+            if (day + timedelta(days=3)).month != day.month:
+                weight += 1.0
+            if day.month == 12:
+                weight += 1.5
+        weights.append(weight)
+    return list(itertools.accumulate(weights))
+
+
+def create_test_data(db_name=DB_NAME, departments=4, sponsors=3, wards=6, doctors=6, donations=6,
+                     examinations=6, years=2, seed=42, chunk_size=INSERT_CHUNK_SIZE, end_date=None):
+    """Заполнение базы синтетическими данными.
+
+    Существующие данные удаляются, новые вставляются пачками executemany
+    одной транзакцией с synchronous=OFF; индексы отчетов и помесячные итоги
+    пожертвований строятся после загрузки. Даты берутся за years лет до end_date (по умолчанию сегодня);
+    одинаковые seed и end_date дают одинаковые данные.
+    Возвращает словарь: таблица -> число строк, плюс seconds и rows_per_sec.
+    """
+    rnd = random.Random(seed)
+    first_date = (end_date or date.today()) - timedelta(days=365 * years)
+    all_days = [first_date + timedelta(days=offset) for offset in range(365 * years)]
+
+    conn = sqlite3.connect(db_name)
+    start = time.perf_counter()
+    counts = {}
 
     try:
-        # Очистка существующих данных
+        create_schema(conn)
+        create_donation_rollup(conn)
+        create_payroll_summary(conn)
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        conn.execute("PRAGMA synchronous = OFF")
+
+        conn.execute("BEGIN")
+        drop_report_indexes(conn)
+        drop_donation_rollup_triggers(conn)
+        drop_payroll_summary_triggers(conn)
+
+        # Очистка существующих данных и сброс автоинкремента
         tables = ['examinations', 'donations', 'doctors', 'wards', 'sponsors', 'departments']
         for table in tables:
-            cursor.execute(f"DELETE FROM {table}")
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"DELETE FROM sqlite_sequence WHERE name IN ({', '.join('?' for _ in tables)})", tables)
 
-        # Сброс автоинкремента
-        for table in tables:
-            cursor.execute(f"DELETE FROM sqlite_sequence WHERE name='{table}'")
-
-        # Добавление отделений
-        departments = [
-            ('Педиатрическое отделение', 'Лечение и наблюдение детей'),
-            ('Травматологическое отделение', 'Лечение травм и переломов'),
-            ('Эндокринологическое отделение', 'Заболевания эндокринной системы'),
-            ('Офтальмологическое отделение', 'Диагностика и лечение зрения')
-        ]
-        cursor.executemany(
-            "INSERT INTO departments (name, description) VALUES (?, ?)",
-            departments
-        )
-
-        # Добавление спонсоров
-        sponsors = [
-            ('HealthPlus', 'Андреева Наталья', '+7-901-234-56-78'),
-            ('MedInvest', 'Ковалёв Роман', '+7-902-345-67-89'),
-            ('LifeCare', 'Орлова Анна', '+7-903-456-78-90')
-        ]
-        cursor.executemany(
-            "INSERT INTO sponsors (company_name, contact_person, phone) VALUES (?, ?, ?)",
-            sponsors
-        )
-
-        # Добавление палат
-        wards = [
-            ('Палата 101', 1, 4),
-            ('Палата 102', 1, 3),
-            ('Палата 201', 2, 2),
-            ('Палата 202', 2, 2),
-            ('Палата 301', 3, 3),
-            ('Палата 401', 4, 4)
-        ]
-        cursor.executemany("INSERT INTO wards (name, department_id, capacity) VALUES (?, ?, ?)", wards)
-
-        # Добавление врачей
-        doctors = [
-            ('Антон', 'Мельников', 'Педиатр', 52000, 9000, 1, 0),
-            ('Ирина', 'Белова', 'Травматолог', 68000, 14000, 2, 0),
-            ('Максим', 'Егоров', 'Эндокринолог', 61000, 11000, 3, 1),
-            ('Светлана', 'Романова', 'Офтальмолог', 57000, 8500, 4, 0),
-            ('Павел', 'Дорохов', 'Педиатр', 50000, 6000, 1, 0),
-            ('Юлия', 'Никитина', 'Травматолог', 73000, 16000, 2, 1)
-        ]
-        cursor.executemany(
-            '''INSERT INTO doctors 
-               (first_name, last_name, specialization, salary_base, salary_bonus, department_id, on_vacation) 
-               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-            doctors
-        )
-
-        # Добавление пожертвований
-        donations = [
-            (1, 1, 42000, '2024-03-05'),
-            (2, 2, 90000, '2024-03-10'),
-            (3, 3, 67000, '2024-03-15'),
-            (1, 4, 38000, '2024-03-20'),
-            (2, 1, 51000, '2024-03-25'),
-            (3, 2, 86000, '2024-03-28')
-        ]
-        cursor.executemany(
-            '''INSERT INTO donations 
-               (sponsor_id, department_id, amount, donation_date) 
-               VALUES (?, ?, ?, ?)''',
-            donations
-        )
-
-        # Добавление обследований
-        examinations = [
-            (1, 1, 'Громов И.С.', '2024-03-02', 'ОРЗ'),
-            (2, 2, 'Лебедева Н.А.', '2024-03-04', 'Вывих плеча'),
-            (3, 3, 'Фёдоров К.М.', '2024-03-06', 'Сахарный диабет'),
-            (4, 4, 'Соколова Е.П.', '2024-03-08', 'Близорукость'),
-            (5, 1, 'Тарасов Д.В.', '2024-03-11', 'Ангина'),
-            (6, 2, 'Морозова О.Н.', '2024-03-13', 'Перелом руки')
-        ]
-
-        cursor.executemany('''INSERT INTO examinations 
-                          (doctor_id, department_id, patient_name, examination_date, diagnosis) 
-                          VALUES (?, ?, ?, ?, ?)''', examinations)
+        # Отделения: профили по кругу, при повторе добавляется номер
+        profile_names = list(DEPARTMENT_PROFILES)
+        department_profiles = []
+        department_rows = []
+        for i in range(departments):
+            base = profile_names[i % len(profile_names)]
+            name = base if i < len(profile_names) else f"{base} №{i // len(profile_names) + 1}"
+            department_profiles.append(DEPARTMENT_PROFILES[base])
+            department_rows.append((name, f"{base}: {', '.join(DEPARTMENT_PROFILES[base][1]).lower()}"))
+        conn.executemany("INSERT INTO departments (name, description) VALUES (?, ?)", department_rows)
+        counts['departments'] = departments
+
+        # Спонсоры: названия из сочетаний слов, при повторе добавляется номер
+        companies = [word + suffix for word in COMPANY_WORDS for suffix in COMPANY_SUFFIXES]
+        rnd.shuffle(companies)
+
+        def sponsor_rows():
+            for i in range(sponsors):
+                first, last = person(rnd)
+                company = companies[i % len(companies)]
+                yield (company if i < len(companies) else f"{company} {i // len(companies) + 1}",
+                       f"{last} {first}", f"+7-9{rnd.randint(0, 99):02d}-{rnd.randint(0, 9999999):07d}")
+
+        for chunk in chunks(sponsor_rows(), chunk_size):
+            conn.executemany("INSERT INTO sponsors (company_name, contact_person, phone) VALUES (?, ?, ?)", chunk)
+        counts['sponsors'] = sponsors
+
+        def ward_rows():
+            for i in range(wards):
+                department_id = i % departments + 1
+                yield (f"Палата {department_id}{i // departments + 1:02d}", department_id,
+                       rnd.choice((1, 2, 2, 3, 4, 4, 6)))
 
+        for chunk in chunks(ward_rows(), chunk_size):
+            conn.executemany("INSERT INTO wards (name, department_id, capacity) VALUES (?, ?, ?)", chunk)
+        counts['wards'] = wards
+
+        # Врачи: оклад около 60 000 с разбросом, премия есть у 80%, в отпуске ~8%
+        doctor_departments = [rnd.randint(1, departments) for _ in range(doctors)]
+
+        def doctor_rows():
+            for department_id in doctor_departments:
+                first, last = person(rnd)
+                salary_base = round(max(30000.0, rnd.gauss(60000, 12000)), -2)
+                salary_bonus = round(salary_base * rnd.uniform(0.05, 0.25), -2) if rnd.random() < 0.8 else None
+                yield (first, last, department_profiles[department_id - 1][0], salary_base, salary_bonus,
+                       department_id, int(rnd.random() < 0.08))
+
+        for chunk in chunks(doctor_rows(), chunk_size):
+            conn.executemany(
+                '''INSERT INTO doctors
+                   (first_name, last_name, specialization, salary_base, salary_bonus, department_id, on_vacation)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                chunk
+            )
+        counts['doctors'] = doctors
+
+        # Пожертвования: немногие крупные спонсоры дают большую часть, суммы логнормальные
+        sponsor_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, sponsors + 1)))
+        donation_days = date_weights(first_date, len(all_days))
+
+        def donation_rows():
+            for chunk_start in range(0, donations, chunk_size):
+                size = min(chunk_size, donations - chunk_start)
+                sponsor_ids = rnd.choices(range(1, sponsors + 1), cum_weights=sponsor_weights, k=size)
+                days = rnd.choices(all_days, cum_weights=donation_days, k=size)
+                for sponsor_id, day in zip(sponsor_ids, days):
+                    yield (sponsor_id, rnd.randint(1, departments),
+                           round(rnd.lognormvariate(10.8, 0.7), -2), day.isoformat())
+
+        for chunk in chunks(donation_rows(), chunk_size):
+            conn.executemany(
+                '''INSERT INTO donations
+                   (sponsor_id, department_id, amount, donation_date)
+                   VALUES (?, ?, ?, ?)''',
+                chunk
+            )
+        counts['donations'] = donations
+
+        # Обследования: только в рабочие дни, диагноз по профилю отделения врача
+        examination_days = date_weights(first_date, len(all_days), weekdays_only=True)
+
+        def examination_rows():
+            for chunk_start in range(0, examinations, chunk_size):
+                size = min(chunk_size, examinations - chunk_start)
+                days = rnd.choices(all_days, cum_weights=examination_days, k=size)
+                for day in days:
+                    doctor_id = rnd.randint(1, doctors)
+                    department_id = doctor_departments[doctor_id - 1]
+                    first, last = person(rnd)
+                    yield (doctor_id, department_id, f"{last} {first[0]}.{rnd.choice(FIRST_NAMES)[0]}.",
+                           day.isoformat(), rnd.choice(department_profiles[department_id - 1][1]))
+
+        if doctors:
+            for chunk in chunks(examination_rows(), chunk_size):
+                conn.executemany(
+                    '''INSERT INTO examinations
+                       (doctor_id, department_id, patient_name, examination_date, diagnosis)
+                       VALUES (?, ?, ?, ?, ?)''',
+                    chunk
+                )
+            counts['examinations'] = examinations
+        else:
+            counts['examinations'] = 0
+
+        # Итоги считаются одним запросом вместо срабатывания триггера на каждую строку
+        rebuild_donation_rollup(conn)
+        rebuild_payroll_summary(conn)
+        create_donation_rollup_triggers(conn)
+        create_payroll_summary_triggers(conn)
         conn.commit()
-        print("Тестовые данные успешно добавлены в базу данных!")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        create_report_indexes(conn)
+        conn.execute("ANALYZE")
 
-    except sqlite3.Error as e:
-        print(f"Ошибка при добавлении тестовых данных: {e}")
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
+    seconds = time.perf_counter() - start
+    counts['seconds'] = seconds
+    counts['rows_per_sec'] = sum(counts[table] for table in tables) / seconds if seconds else 0.0
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация тестовых данных для базы 'Больница'")
+    parser.add_argument('--db', default=DB_NAME, help="файл базы данных")
+    parser.add_argument('--departments', type=int, default=4)
+    parser.add_argument('--sponsors', type=int, default=3)
+    parser.add_argument('--wards', type=int, default=6)
+    parser.add_argument('--doctors', type=int, default=6)
+    parser.add_argument('--donations', type=int, default=6)
+    parser.add_argument('--examinations', type=int, default=6)
+    parser.add_argument('--years', type=int, default=2, help="период дат пожертвований и обследований, лет")
+    parser.add_argument('--end-date', type=date.fromisoformat, help="последняя дата в данных (ГГГГ-ММ-ДД)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=INSERT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.departments < 1 or args.sponsors < 1:
+        print("Нужно хотя бы одно отделение и один спонсор")
+        return
+
+    try:
+        stats = create_test_data(args.db, args.departments, args.sponsors, args.wards, args.doctors,
+                                 args.donations, args.examinations, args.years, args.seed, args.chunk_size,
+                                 args.end_date)
+    except sqlite3.Error as e:
+        print(f"Ошибка при добавлении тестовых данных: {e}")
+        return
+
+    print("Тестовые данные успешно добавлены в базу данных!")
+    for table in ('departments', 'sponsors', 'wards', 'doctors', 'donations', 'examinations'):
+        print(f"  {table}: {stats[table]}")
+    print(f"Время: {stats['seconds']:.2f} с, скорость: {stats['rows_per_sec']:,.0f} строк/с")
+
 
 if __name__ == "__main__":
-    create_test_data()
+    main()
@@ -1,7 +1,1384 @@
+import bisect
+import csv
+import itertools
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-from datetime import datetime
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+
+DB_NAME = 'hospital.db'
+
+# Сколько соединение ждет освобождения блокировки записи (другим
+# соединением или экземпляром приложения), прежде чем вернуть
+# "database is locked", мс
+BUSY_TIMEOUT_MS = 10000
+# Число соединений только для чтения и потоков фоновых отчетов
+READER_POOL_SIZE = 3
+# PRAGMA каждого соединения; в режиме WAL synchronous = NORMAL не
+# нарушает целостность базы при сбое, но не делает fsync на каждый COMMIT
+CONNECTION_PRAGMAS = {'busy_timeout': BUSY_TIMEOUT_MS, 'synchronous': 'NORMAL'}
+
+# Виртуальная прокрутка таблицы данных: в Treeview держится не больше
+# TREE_WINDOW_PAGES страниц, следующая страница подгружается при подходе
+# к краю окна (доля TREE_SCROLL_EDGE от высоты прокрутки)
+TREE_PAGE_SIZE = 200
+TREE_WINDOW_PAGES = 3
+TREE_SCROLL_EDGE = 0.1
+
+# Период опроса очереди результатов фоновых запросов, мс
+QUERY_POLL_MS = 50
+
+# Число строк на странице отчета; следующая страница загружается по кнопке
+REPORT_PAGE_SIZE = 5000
+# Число строк отчета, вставляемых в текстовое поле за один раз
+REPORT_CHUNK_ROWS = 500
+
+# Число строк в одной транзакции массового обновления или удаления
+MASS_CHANGE_BATCH_SIZE = 10000
+
+# Таблицы для импорта и экспорта CSV в порядке внешних ключей (родители раньше детей)
+TRANSFER_TABLES = ('departments', 'sponsors', 'wards', 'doctors', 'donations', 'examinations')
+# Число строк в одном executemany при импорте и в одном fetchmany при экспорте
+TRANSFER_CHUNK_SIZE = 50000
+
+# Префикс теневых таблиц и триггеров синхронизации при перестройке таблицы
+REBUILD_PREFIX = '_rebuild_'
+# Начальные слова ограничений таблицы в CREATE TABLE (в отличие от определений столбцов)
+TABLE_CONSTRAINT_WORDS = ('CONSTRAINT', 'PRIMARY', 'UNIQUE', 'CHECK', 'FOREIGN')
+# Ограничение REFERENCES в определении столбца
+INLINE_REFERENCES = re.compile(
+    r'\s+REFERENCES\s+[\w"`\[\]]+\s*(\([^)]*\))?'
+    r'(\s+(ON\s+(DELETE|UPDATE)\s+(SET\s+NULL|SET\s+DEFAULT|CASCADE|RESTRICT|NO\s+ACTION)|MATCH\s+\w+'
+    r'|(NOT\s+)?DEFERRABLE(\s+INITIALLY\s+(DEFERRED|IMMEDIATE))?))*', re.IGNORECASE)
+
+# Запросы отчетов. Последние столбцы постраничных отчетов - ключ страниц
+# из REPORT_PAGE_KEYS (id делает порядок строк однозначным)
+REPORT_QUERIES = {
+    'doctors_specializations': '''
+        SELECT first_name || ' ' || last_name AS full_name, specialization, id
+        FROM doctors
+        ORDER BY full_name, id
+    ''',
+    # Зарплата без оклада считается нулевой: ключ страниц не может быть NULL
+    'doctors_not_on_vacation': '''
+        SELECT last_name, IFNULL(salary_base + COALESCE(salary_bonus, 0), 0) AS total_salary, id
+        FROM doctors
+        WHERE on_vacation = 0
+        ORDER BY total_salary DESC, id DESC
+    ''',
+    # Отделение и спонсор выбираются в NamePickerDialog, отчеты получают их id
+    'wards_by_department': '''
+        SELECT name, capacity, id
+        FROM wards
+        WHERE department_id = ?
+        ORDER BY name, id
+    ''',
+    'departments_by_sponsor': '''
+        SELECT d.name, d.description, d.id
+        FROM departments d
+        WHERE d.id IN (SELECT department_id FROM donations WHERE sponsor_id = ?)
+        ORDER BY d.id
+    ''',
+    # Итоги за месяц берутся из donation_monthly, без чтения самих пожертвований
+    'donations_month_totals': '''
+        SELECT d.name, SUM(r.donation_count), SUM(r.total_amount)
+        FROM donation_monthly r
+        LEFT JOIN departments d ON r.department_id = d.id
+        WHERE r.month = ?
+        GROUP BY r.department_id
+        ORDER BY 3 DESC
+    ''',
+    # Страница пожертвований месяца после ключа (дата, id): (после даты, после id, конец месяца, размер).
+    # LEFT JOIN: пожертвования без отделения или спонсора тоже входят в итоги donation_monthly
+    'donations_by_month': '''
+        SELECT dn.id, d.name, s.company_name, dn.amount, dn.donation_date
+        FROM donations dn
+        LEFT JOIN departments d ON dn.department_id = d.id
+        LEFT JOIN sponsors s ON dn.sponsor_id = s.id
+        WHERE (dn.donation_date, dn.id) > (?, ?) AND dn.donation_date < ?
+        ORDER BY dn.donation_date, dn.id
+        LIMIT ?
+    ''',
+    # Сводка зарплат по отделениям берется из doctor_payroll, без чтения врачей
+    'doctors_payroll': '''
+        SELECT d.name, p.active_count, p.vacation_count, p.active_salary
+        FROM doctor_payroll p
+        LEFT JOIN departments d ON p.department_id = d.id
+        ORDER BY p.active_salary DESC
+    ''',
+    'doctors_departments': '''
+        SELECT d.last_name, d.first_name, dep.name, d.specialization, dep.id, d.id
+        FROM doctors d
+        JOIN departments dep ON d.department_id = dep.id
+        ORDER BY dep.name, dep.id, d.last_name, d.id
+    ''',
+}
+
+# Ключи постраничных отчетов: отчет -> (выражения ORDER BY, номера их столбцов
+# в строке, по убыванию). Следующая страница читается после ключа последней
+# строки (см. keyset_query), поэтому не перечитывает предыдущие
+REPORT_PAGE_KEYS = {
+    'doctors_specializations': (("first_name || ' ' || last_name", 'id'), (0, 2), False),
+    'doctors_not_on_vacation': (('IFNULL(salary_base + COALESCE(salary_bonus, 0), 0)', 'id'), (1, 2), True),
+    'wards_by_department': (('name', 'id'), (0, 2), False),
+    'departments_by_sponsor': (('d.id',), (2,), False),
+    'doctors_departments': (('dep.name', 'dep.id', 'd.last_name', 'd.id'), (2, 4, 0, 5), False),
+}
+
+# Покрывающие индексы под запросы отчетов: имя -> (таблица, столбцы).
+# Выражения в индексах должны совпадать с выражениями в REPORT_QUERIES,
+# иначе планировщик их не использует.
+REPORT_INDEXES = {
+    # Ключи страниц (REPORT_PAGE_KEYS) - начало индекса, id сразу после сортируемых столбцов
+    # doctors_specializations: сортировка по ФИО без временного B-дерева
+    'idx_doctors_full_name_id': ('doctors', ("first_name || ' ' || last_name", 'id', 'specialization',
+                                             'first_name', 'last_name')),
+    # doctors_not_on_vacation: отбор по отпуску и сортировка по полной зарплате
+    'idx_doctors_vacation_total_id': ('doctors', ('on_vacation', 'IFNULL(salary_base + COALESCE(salary_bonus, 0), 0)',
+                                                  'id', 'last_name', 'salary_base', 'salary_bonus')),
+    # wards_by_department: палаты отделения в порядке названий
+    'idx_wards_department_name_id': ('wards', ('department_id', 'name', 'id', 'capacity')),
+    # doctors_departments: сортировка отделений по названию, врачи отделения без чтения таблицы
+    'idx_departments_name': ('departments', ('name',)),
+    'idx_doctors_department_name_id': ('doctors', ('department_id', 'last_name', 'id', 'first_name',
+                                                   'specialization')),
+    # departments_by_sponsor: отделения из пожертвований спонсора без чтения таблицы
+    'idx_donations_sponsor_department': ('donations', ('sponsor_id', 'department_id')),
+    # donations_by_month: диапазон дат и порядок страниц (дата, id), все нужные столбцы в индексе
+    'idx_donations_date_id': ('donations', ('donation_date', 'id', 'department_id', 'sponsor_id', 'amount')),
+}
+
+# Индексы прежних версий, замененные индексами из REPORT_INDEXES
+OBSOLETE_INDEXES = ('idx_donations_date', 'idx_sponsors_company_name', 'idx_doctors_full_name',
+                    'idx_doctors_vacation_salary', 'idx_wards_department_name', 'idx_doctors_department_name')
+
+# Справочники для выбора в отчетах: таблица -> запрос (id, название)
+NAME_INDEX_QUERIES = {
+    'departments': "SELECT id, name FROM departments",
+    'sponsors': "SELECT id, company_name FROM sponsors",
+}
+# Число вариантов в списке NamePickerDialog
+NAME_PICKER_LIMIT = 50
+
+# Помесячные итоги пожертвований по отделениям и спонсорам.
+# Пустые отделение, спонсор и дата хранятся как 0 и ''.
+DONATION_ROLLUP_TABLE = '''
+    CREATE TABLE IF NOT EXISTS donation_monthly (
+        month TEXT NOT NULL,
+        department_id INTEGER NOT NULL,
+        sponsor_id INTEGER NOT NULL,
+        donation_count INTEGER NOT NULL,
+        total_amount REAL NOT NULL,
+        PRIMARY KEY (month, department_id, sponsor_id)
+    ) WITHOUT ROWID
+'''
+
+# Добавление строки {row} (NEW или OLD) к итогам и вычитание из итогов
+DONATION_ROLLUP_ADD = '''
+    INSERT INTO donation_monthly (month, department_id, sponsor_id, donation_count, total_amount)
+    VALUES (IFNULL(substr({row}.donation_date, 1, 7), ''), IFNULL({row}.department_id, 0),
+            IFNULL({row}.sponsor_id, 0), 1, IFNULL({row}.amount, 0))
+    ON CONFLICT (month, department_id, sponsor_id) DO UPDATE SET
+        donation_count = donation_count + 1,
+        total_amount = total_amount + excluded.total_amount;
+'''
+DONATION_ROLLUP_SUBTRACT = '''
+    UPDATE donation_monthly
+    SET donation_count = donation_count - 1,
+        total_amount = total_amount - IFNULL({row}.amount, 0)
+    WHERE month = IFNULL(substr({row}.donation_date, 1, 7), '')
+      AND department_id = IFNULL({row}.department_id, 0)
+      AND sponsor_id = IFNULL({row}.sponsor_id, 0);
+    DELETE FROM donation_monthly
+    WHERE month = IFNULL(substr({row}.donation_date, 1, 7), '')
+      AND department_id = IFNULL({row}.department_id, 0)
+      AND sponsor_id = IFNULL({row}.sponsor_id, 0)
+      AND donation_count <= 0;
+'''
+DONATION_ROLLUP_TRIGGERS = {
+    'trg_donations_rollup_insert': ('AFTER INSERT ON donations',
+                                    DONATION_ROLLUP_ADD.format(row='NEW')),
+    'trg_donations_rollup_delete': ('AFTER DELETE ON donations',
+                                    DONATION_ROLLUP_SUBTRACT.format(row='OLD')),
+    'trg_donations_rollup_update': ('AFTER UPDATE OF sponsor_id, department_id, amount, donation_date ON donations',
+                                    DONATION_ROLLUP_SUBTRACT.format(row='OLD') + DONATION_ROLLUP_ADD.format(row='NEW')),
+}
+
+
+# Сводка зарплат по отделениям: число работающих врачей и врачей в отпуске
+# и суммы их полных зарплат. Врачи без отделения хранятся под 0, NULL в
+# on_vacation считается как "в отпуске" (так же, как в отчете).
+PAYROLL_SUMMARY_TABLE = '''
+    CREATE TABLE IF NOT EXISTS doctor_payroll (
+        department_id INTEGER PRIMARY KEY,
+        active_count INTEGER NOT NULL,
+        vacation_count INTEGER NOT NULL,
+        active_salary REAL NOT NULL,
+        vacation_salary REAL NOT NULL
+    )
+'''
+
+# Учет строки {row} (NEW или OLD) в сводке со знаком {sign}: 1 - добавление, -1 - вычитание
+PAYROLL_SUMMARY_CHANGE = '''
+    INSERT INTO doctor_payroll (department_id, active_count, vacation_count, active_salary, vacation_salary)
+    SELECT IFNULL({row}.department_id, 0), {sign} * active, {sign} * (1 - active),
+           {sign} * active * salary, {sign} * (1 - active) * salary
+    FROM (SELECT IFNULL({row}.on_vacation = 0, 0) AS active,
+                 IFNULL({row}.salary_base + COALESCE({row}.salary_bonus, 0), 0) AS salary)
+    WHERE true
+    ON CONFLICT (department_id) DO UPDATE SET
+        active_count = active_count + excluded.active_count,
+        vacation_count = vacation_count + excluded.vacation_count,
+        active_salary = active_salary + excluded.active_salary,
+        vacation_salary = vacation_salary + excluded.vacation_salary;
+    DELETE FROM doctor_payroll
+    WHERE department_id = IFNULL({row}.department_id, 0)
+      AND active_count + vacation_count <= 0;
+'''
+PAYROLL_SUMMARY_TRIGGERS = {
+    'trg_doctors_payroll_insert': ('AFTER INSERT ON doctors',
+                                   PAYROLL_SUMMARY_CHANGE.format(row='NEW', sign=1)),
+    'trg_doctors_payroll_delete': ('AFTER DELETE ON doctors',
+                                   PAYROLL_SUMMARY_CHANGE.format(row='OLD', sign=-1)),
+    'trg_doctors_payroll_update': ('AFTER UPDATE OF department_id, on_vacation, salary_base, salary_bonus ON doctors',
+                                   PAYROLL_SUMMARY_CHANGE.format(row='OLD', sign=-1)
+                                   + PAYROLL_SUMMARY_CHANGE.format(row='NEW', sign=1)),
+}
+
+
+def keyset_query(query, keys, descending=False):
+    """Запрос страницы query после ключа keys (выражения из ORDER BY).
+
+    Условие по ключу добавляется перед ORDER BY (через AND, если в query
+    уже есть WHERE), в конец - LIMIT ?. Параметры: параметры query,
+    значение первого выражения ключа, значения всех выражений, размер
+    страницы. Отдельное условие на первое выражение нужно для поиска по
+    индексу: сравнение наборов значений с выражениями SQLite по индексу
+    не ищет.
+    """
+    head, order = re.split(r'\bORDER\s+BY\b', query, flags=re.IGNORECASE)
+    op = '<' if descending else '>'
+    condition = f"{keys[0]} {op}= ? AND ({', '.join(keys)}) {op} ({', '.join('?' for _ in keys)})"
+    joiner = 'AND' if re.search(r'\bWHERE\b', head, re.IGNORECASE) else 'WHERE'
+    return f"{head.rstrip()} {joiner} {condition} ORDER BY {order.strip()} LIMIT ?"
+
+
+def create_schema(conn):
+    """Создание таблиц базы данных 'Больница', если их еще нет"""
+    # Для новой базы: освобожденные страницы можно вернуть через incremental_vacuum
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # Если заголовок файла уже записан (например, при включении WAL), режим вступает в силу только после VACUUM
+    if (conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+            and not conn.execute("SELECT 1 FROM sqlite_master").fetchone()):
+        conn.execute("VACUUM")
+
+    # Таблица отделений
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT
+        )
+    ''')
+
+    # Таблица спонсоров
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sponsors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            company_name TEXT NOT NULL,
+            contact_person TEXT,
+            phone TEXT
+        )
+    ''')
+
+    # Таблица палат
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS wards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            department_id INTEGER,
+            capacity INTEGER,
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Таблица врачей
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS doctors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            specialization TEXT,
+            salary_base REAL,
+            salary_bonus REAL,
+            department_id INTEGER,
+            on_vacation BOOLEAN DEFAULT 0,
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Таблица пожертвований
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS donations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sponsor_id INTEGER,
+            department_id INTEGER,
+            amount REAL,
+            donation_date DATE,
+            FOREIGN KEY (sponsor_id) REFERENCES sponsors (id),
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    # Таблица обследований
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS examinations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER,
+            department_id INTEGER,
+            patient_name TEXT,
+            examination_date DATE,
+            diagnosis TEXT,
+            FOREIGN KEY (doctor_id) REFERENCES doctors (id),
+            FOREIGN KEY (department_id) REFERENCES departments (id)
+        )
+    ''')
+
+    conn.commit()
+
+
+def create_report_indexes(conn):
+    """Создание индексов отчетов, которых еще нет.
+
+    Индексы, столбцов которых в таблице уже нет, пропускаются; возвращается
+    список их имен.
+    """
+    for name in OBSOLETE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    skipped = []
+    for name, (table, columns) in REPORT_INDEXES.items():
+        try:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        except sqlite3.OperationalError as e:
+            if 'no such column' not in str(e):
+                raise
+            skipped.append(name)
+    conn.commit()
+    # Сбор статистики для новых индексов (ANALYZE только там, где это нужно)
+    conn.execute("PRAGMA optimize")
+    return skipped
+
+
+def drop_report_indexes(conn):
+    """Удаление индексов отчетов (например, на время массовой загрузки)"""
+    for name in REPORT_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def create_donation_rollup(conn):
+    """Создание таблицы помесячных итогов и ее триггеров.
+
+    Новая таблица сразу заполняется по donations, все делается одной
+    транзакцией.
+    """
+    # DDL не открывает транзакцию сама, поэтому начинаем ее явно; IMMEDIATE
+    # сразу берет блокировку записи, иначе в режиме WAL переход от чтения
+    # к записи может завершиться ошибкой, если другое соединение успело
+    # зафиксировать изменения
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'donation_monthly'").fetchone()
+        conn.execute(DONATION_ROLLUP_TABLE)
+        if not exists:
+            rebuild_donation_rollup(conn)
+        create_donation_rollup_triggers(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def rebuild_donation_rollup(conn):
+    """Полный пересчет помесячных итогов по donations"""
+    conn.execute("DELETE FROM donation_monthly")
+    conn.execute('''
+        INSERT INTO donation_monthly (month, department_id, sponsor_id, donation_count, total_amount)
+        SELECT IFNULL(substr(donation_date, 1, 7), ''), IFNULL(department_id, 0), IFNULL(sponsor_id, 0),
+               COUNT(*), TOTAL(amount)
+        FROM donations
+        GROUP BY 1, 2, 3
+    ''')
+
+
+def create_donation_rollup_triggers(conn):
+    for name, (event, body) in DONATION_ROLLUP_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+def drop_donation_rollup_triggers(conn):
+    """Удаление триггеров итогов (на время массовой загрузки)"""
+    for name in DONATION_ROLLUP_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def create_payroll_summary(conn):
+    """Создание сводки зарплат и ее триггеров.
+
+    Новая таблица сразу заполняется по doctors, все делается одной
+    транзакцией.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'doctor_payroll'").fetchone()
+        conn.execute(PAYROLL_SUMMARY_TABLE)
+        if not exists:
+            rebuild_payroll_summary(conn)
+        create_payroll_summary_triggers(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def rebuild_payroll_summary(conn):
+    """Полный пересчет сводки зарплат по doctors"""
+    conn.execute("DELETE FROM doctor_payroll")
+    conn.execute('''
+        INSERT INTO doctor_payroll (department_id, active_count, vacation_count, active_salary, vacation_salary)
+        SELECT IFNULL(department_id, 0), SUM(active), SUM(1 - active), TOTAL(active * salary),
+               TOTAL((1 - active) * salary)
+        FROM (SELECT department_id, IFNULL(on_vacation = 0, 0) AS active,
+                     IFNULL(salary_base + COALESCE(salary_bonus, 0), 0) AS salary
+              FROM doctors)
+        GROUP BY 1
+    ''')
+
+
+def create_payroll_summary_triggers(conn):
+    for name, (event, body) in PAYROLL_SUMMARY_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+
+def drop_payroll_summary_triggers(conn):
+    """Удаление триггеров сводки зарплат (на время массовой загрузки)"""
+    for name in PAYROLL_SUMMARY_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def change_in_batches(conn, table, statement, params=(), batch_size=MASS_CHANGE_BATCH_SIZE, progress=None,
+                      vacuum=False, condition=None):
+    """Выполнение UPDATE, DELETE или INSERT ... SELECT для всей таблицы пачками по диапазонам rowid.
+
+    statement - запрос к table без WHERE (например, "DELETE FROM doctors"),
+    к нему добавляется условие на диапазон rowid очередной пачки и, если
+    задано, дополнительное условие condition. Каждая пачка
+    фиксируется отдельно, поэтому блокировка записи и журнал не держатся
+    на всю операцию. progress(done, total) вызывается после каждой пачки и
+    может прервать операцию исключением, уже зафиксированные пачки
+    остаются. При vacuum и auto_vacuum = INCREMENTAL в конце освобождаются
+    пустые страницы файла. Возвращает число измененных строк.
+    """
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    changed = 0
+    last = None
+    while True:
+        # Верхняя граница пачки - batch_size-й rowid после предыдущей
+        if last is None:
+            row = conn.execute(f"SELECT rowid FROM {table} ORDER BY rowid LIMIT 1 OFFSET ?",
+                               (batch_size - 1,)).fetchone()
+        else:
+            row = conn.execute(f"SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?",
+                               (last, batch_size - 1)).fetchone()
+        upper = row[0] if row else None
+
+        conditions, bounds = [condition] if condition else [], []
+        if last is not None:
+            conditions.append("rowid > ?")
+            bounds.append(last)
+        if upper is not None:
+            conditions.append("rowid <= ?")
+            bounds.append(upper)
+        query = f"{statement} WHERE {' AND '.join(conditions)}" if conditions else statement
+
+        cursor = conn.execute(query, (*params, *bounds))
+        conn.commit()
+        changed += cursor.rowcount
+        if progress:
+            progress(min(changed, total), total)
+
+        if upper is None:
+            break
+        last = upper
+
+    if vacuum and conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        # execute() выполняет только первый шаг прагмы (одну страницу), executescript - до конца
+        conn.executescript("PRAGMA incremental_vacuum")
+    return changed
+
+
+def split_definitions(sql):
+    """Разбор CREATE TABLE: список определений столбцов и ограничений и хвост после скобок"""
+    start, end = sql.index('('), sql.rindex(')')
+    parts, depth, quote, current = [], 0, None, []
+    for char in sql[start + 1:end]:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == '[':
+            quote = ']'
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current).strip())
+    return parts, sql[end + 1:].strip()
+
+
+def definition_name(definition):
+    """Имя столбца из определения столбца (без кавычек)"""
+    return definition.split(None, 1)[0].strip('"`[]')
+
+
+def drop_rebuild_objects(conn, table):
+    """Удаление теневой таблицы и триггеров синхронизации незавершенной перестройки"""
+    shadow = REBUILD_PREFIX + table
+    for event in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {shadow}_{event}")
+    conn.execute(f"DROP TABLE IF EXISTS {shadow}")
+    conn.commit()
+
+
+def is_table_constraint(part):
+    return part.split(None, 1)[0].upper() in TABLE_CONSTRAINT_WORDS
+
+
+def constraint_columns(part):
+    """Имена столбцов в первых скобках ограничения таблицы (в нижнем регистре)"""
+    return [definition_name(name).lower() for name in part[part.index('(') + 1:part.index(')')].split(',')]
+
+
+def find_column(columns, column):
+    """Имя столбца column в написании таблицы"""
+    name = next((name for name in columns if name.lower() == column.lower()), None)
+    if name is None:
+        raise ValueError(f"Столбец '{column}' не найден")
+    return name
+
+
+def column_change(column, definition=None):
+    """Изменение для rebuild_table: новое определение столбца column или, без definition, его удаление"""
+    def change(parts, columns):
+        old_name = find_column(columns, column)
+        if definition is None and len(columns) == 1:
+            raise ValueError("Нельзя удалить единственный столбец таблицы")
+
+        pattern = re.compile(rf'\b{re.escape(old_name)}\b', re.IGNORECASE)
+        new_parts = []
+        for part in parts:
+            constraint = is_table_constraint(part)
+            if not constraint and definition_name(part).lower() == old_name.lower():
+                if definition is not None:
+                    new_parts.append(definition)
+            elif constraint and definition is None and pattern.search(part):
+                # Внешний ключ только по удаляемому столбцу удаляется вместе с ним
+                if not (part.upper().startswith('FOREIGN') and constraint_columns(part) == [old_name.lower()]):
+                    raise ValueError(f"Столбец '{old_name}' используется в ограничении: {part}")
+            else:
+                new_parts.append(part)
+
+        if definition is None:
+            return new_parts, [(name, name) for name in columns if name != old_name]
+        new_name = definition_name(definition)
+        return new_parts, [(new_name if name == old_name else name, name) for name in columns]
+
+    return change
+
+
+def foreign_key_change(column, ref_table=None, ref_column=None):
+    """Изменение для rebuild_table: внешний ключ column -> ref_table(ref_column) или, без ref_table, его удаление"""
+    def change(parts, columns):
+        name = find_column(columns, column)
+        new_parts = []
+        for part in parts:
+            if is_table_constraint(part):
+                if part.upper().startswith('FOREIGN') and constraint_columns(part) == [name.lower()]:
+                    continue
+            elif definition_name(part).lower() == name.lower():
+                part = INLINE_REFERENCES.sub('', part)
+            new_parts.append(part)
+
+        if ref_table:
+            new_parts.append(f"FOREIGN KEY ({name}) REFERENCES {ref_table} ({ref_column})")
+        elif new_parts == parts:
+            raise ValueError(f"У столбца '{name}' нет внешнего ключа")
+        return new_parts, [(column_name, column_name) for column_name in columns]
+
+    return change
+
+
+def rebuild_table(conn, table, change, batch_size=MASS_CHANGE_BATCH_SIZE, progress=None):
+    """Перестройка таблицы с измененной структурой.
+
+    change(parts, columns) получает определения из CREATE TABLE и имена
+    столбцов и возвращает новые определения и пары (новый столбец, старый
+    столбец) для копирования (см. column_change и foreign_key_change).
+    SQLite не умеет менять определение столбца на месте, поэтому
+    создается теневая таблица с новой структурой, строки копируются в нее
+    пачками по rowid (каждая пачка - отдельная транзакция, чтение таблицы
+    в это время не блокируется), а изменения, сделанные во время
+    копирования, переносятся триггерами синхронизации. Затем одной
+    транзакцией старая таблица удаляется, теневая переименовывается, и
+    пересоздаются индексы и триггеры. progress(done, total) - как в
+    change_in_batches. При ошибке или отмене исходная таблица не меняется.
+    Возвращает список индексов и триггеров, которые не удалось пересоздать
+    (например, использовавшие удаленный столбец). Удалять и переименовывать
+    столбцы, от которых зависят индексы отчетов и триггеры итогов, нельзя:
+    приложение пересоздает их при каждом запуске.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+                       (table,)).fetchone()
+    if row is None:
+        raise ValueError(f"Таблица '{table}' не найдена")
+    parts, tail = split_definitions(row[0])
+    if 'WITHOUT ROWID' in tail.upper():
+        raise ValueError("Перестройка таблиц WITHOUT ROWID не поддерживается")
+
+    columns = [info[1] for info in conn.execute("SELECT * FROM pragma_table_info(?)", (table,))]
+    new_parts, pairs = change(parts, columns)
+    new_columns = [new for new, old in pairs]
+    old_columns = [old for new, old in pairs]
+    # Удаленные и переименованные столбцы
+    kept = {new.lower() for new, old in pairs if new.lower() == old.lower()}
+    removed = [re.compile(rf'\b{re.escape(name)}\b', re.IGNORECASE) for name in columns if name.lower() not in kept]
+
+    used = [name for name, (index_table, index_columns) in REPORT_INDEXES.items()
+            if index_table.lower() == table.lower()
+            and any(pattern.search(column) for pattern in removed for column in index_columns)]
+    used += [name for triggers in (DONATION_ROLLUP_TRIGGERS, PAYROLL_SUMMARY_TRIGGERS)
+             for name, (event, body) in triggers.items()
+             if re.search(rf'\bON\s+{re.escape(table)}\b', event, re.IGNORECASE)
+             and any(pattern.search(event + body) for pattern in removed)]
+    if used:
+        raise ValueError(f"Столбец нужен индексам отчетов и триггерам итогов: {', '.join(used)}")
+
+    shadow = REBUILD_PREFIX + table
+    new_list = ', '.join(['rowid'] + new_columns)
+    values = ', '.join(['NEW.rowid'] + [f"NEW.{name}" for name in old_columns])
+
+    drop_rebuild_objects(conn, table)
+    try:
+        conn.execute(f"CREATE TABLE {shadow} ({', '.join(new_parts)}) {tail}")
+        # Изменения исходной таблицы во время копирования сразу попадают в теневую
+        conn.execute(f"""CREATE TRIGGER {shadow}_insert AFTER INSERT ON {table} BEGIN
+            INSERT OR REPLACE INTO {shadow} ({new_list}) VALUES ({values}); END""")
+        conn.execute(f"""CREATE TRIGGER {shadow}_update AFTER UPDATE ON {table} BEGIN
+            DELETE FROM {shadow} WHERE rowid = OLD.rowid;
+            INSERT OR REPLACE INTO {shadow} ({new_list}) VALUES ({values}); END""")
+        conn.execute(f"""CREATE TRIGGER {shadow}_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM {shadow} WHERE rowid = OLD.rowid; END""")
+        conn.commit()
+
+        change_in_batches(conn, table,
+                          f"INSERT INTO {shadow} ({new_list}) SELECT {', '.join(['rowid'] + old_columns)} FROM {table}",
+                          batch_size=batch_size, progress=progress,
+                          condition=f"NOT EXISTS (SELECT 1 FROM {shadow} s WHERE s.rowid = {table}.rowid)")
+
+        # Подмена таблицы одной транзакцией; внешние ключи на время отключаются (в транзакции нельзя)
+        foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("PRAGMA legacy_alter_table = ON")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if conn.execute(f"SELECT COUNT(*) FROM {shadow}").fetchone()[0] != count:
+                raise ValueError("Копия таблицы не совпадает с исходной, перестройка отменена")
+
+            objects = conn.execute('''
+                SELECT type, name, sql FROM sqlite_master
+                WHERE tbl_name = ? COLLATE NOCASE AND type IN ('index', 'trigger') AND sql IS NOT NULL
+                  AND substr(name, 1, length(?)) != ? ORDER BY type
+            ''', (table, REBUILD_PREFIX, REBUILD_PREFIX)).fetchall()
+            sequence = None
+            if re.search(r'\bAUTOINCREMENT\b', row[0], re.IGNORECASE):
+                sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+            if sequence:
+                conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+            # Тела триггеров проверяются только при срабатывании, поэтому триггеры,
+            # упоминающие удаленный или переименованный столбец, не пересоздаются
+            skipped = []
+            for kind, name, sql in objects:
+                if kind == 'trigger' and any(pattern.search(sql) for pattern in removed):
+                    skipped.append(f"{kind} {name}")
+                    continue
+                try:
+                    conn.execute(sql)
+                except sqlite3.OperationalError:
+                    skipped.append(f"{kind} {name}")
+            conn.commit()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.execute("PRAGMA legacy_alter_table = OFF")
+            conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        drop_rebuild_objects(conn, table)
+        raise
+
+    return skipped
+
+
+def export_tables(conn, directory, tables=TRANSFER_TABLES, chunk_size=TRANSFER_CHUNK_SIZE, progress=None):
+    """Выгрузка таблиц в файлы <таблица>.csv (с заголовком) в каталоге directory.
+
+    Строки читаются из курсора пачками fetchmany и сразу пишутся в файл,
+    поэтому таблица целиком в память не загружается; NULL выгружается как
+    пустая строка. progress(done, total) вызывается после каждой пачки.
+    Возвращает словарь: таблица -> число строк, плюс seconds и rows_per_sec.
+    """
+    start = time.perf_counter()
+    total = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables)
+    stats = {}
+    done = 0
+
+    for table in tables:
+        stats[table] = 0
+        with open(os.path.join(directory, f"{table}.csv"), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            cursor = conn.execute(f"SELECT * FROM {table} ORDER BY rowid")
+            writer.writerow(column[0] for column in cursor.description)
+            while rows := cursor.fetchmany(chunk_size):
+                writer.writerows(rows)
+                stats[table] += len(rows)
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_sec'] = done / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def import_tables(conn, directory, tables=TRANSFER_TABLES, chunk_size=TRANSFER_CHUNK_SIZE, replace=False,
+                  progress=None):
+    """Загрузка файлов <таблица>.csv из каталога directory одной транзакцией.
+
+    Загружаются таблицы, для которых есть файл, в порядке tables (родители
+    раньше детей), поэтому значения внешних ключей уже есть в базе. Файл
+    читается пачками по chunk_size строк, каждая вставляется одним
+    executemany; пустые значения загружаются как NULL. При replace
+    существующие строки этих таблиц сначала удаляются. На время загрузки
+    снимаются индексы отчетов и триггеры итогов пожертвований и сводки
+    зарплат, итоги пересчитываются один раз в конце. progress(done, total) получает
+    прочитанные и общие байты файлов. При ошибке база не меняется.
+    Возвращает словарь: таблица -> число строк, плюс fk_violations,
+    seconds и rows_per_sec.
+    """
+    paths = {table: os.path.join(directory, f"{table}.csv") for table in tables
+             if os.path.exists(os.path.join(directory, f"{table}.csv"))}
+    if not paths:
+        raise ValueError(f"В каталоге {directory} нет файлов таблиц ({', '.join(tables)}).csv")
+
+    start = time.perf_counter()
+    total = sum(os.path.getsize(path) for path in paths.values())
+    done = 0
+    stats = {}
+
+    # DDL не открывает транзакцию сама, поэтому начинаем ее явно
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        drop_report_indexes(conn)
+        drop_donation_rollup_triggers(conn)
+        drop_payroll_summary_triggers(conn)
+        if replace:
+            for table in reversed(list(paths)):
+                conn.execute(f"DELETE FROM {table}")
+
+        for table, path in paths.items():
+            stats[table] = 0
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header:
+                    continue
+                known = {info[1].lower() for info in conn.execute("SELECT * FROM pragma_table_info(?)", (table,))}
+                unknown = [name for name in header if name.lower() not in known]
+                if unknown:
+                    raise ValueError(f"{table}.csv: нет столбцов {', '.join(unknown)} в таблице {table}")
+
+                query = f"INSERT INTO {table} ({', '.join(header)}) VALUES ({', '.join('?' for _ in header)})"
+                while chunk := [[value if value != '' else None for value in row]
+                                for row in itertools.islice(reader, chunk_size)]:
+                    conn.executemany(query, chunk)
+                    stats[table] += len(chunk)
+                    if progress:
+                        progress(done + f.buffer.tell(), total)
+            done += os.path.getsize(path)
+
+        if 'donations' in paths:
+            rebuild_donation_rollup(conn)
+        if 'doctors' in paths:
+            rebuild_payroll_summary(conn)
+        create_donation_rollup_triggers(conn)
+        create_payroll_summary_triggers(conn)
+        stats['fk_violations'] = sum(
+            conn.execute("SELECT COUNT(*) FROM pragma_foreign_key_check(?)", (table,)).fetchone()[0] for table in paths)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    create_report_indexes(conn)
+    stats['seconds'] = time.perf_counter() - start
+    rows = sum(stats[table] for table in paths)
+    stats['rows_per_sec'] = rows / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+class ConnectionManager:
+    """Соединения с базой в режиме WAL: одно соединение записи и пул соединений только для чтения.
+
+    В режиме WAL чтение не блокирует запись и не ждет ее, поэтому отчеты и
+    постраничная загрузка на соединениях из пула идут параллельно с
+    изменениями. Все изменения приложения выполняются на соединении
+    writer; если запись ведет другой процесс, соединение ждет до
+    BUSY_TIMEOUT_MS. Соединения пула открываются по мере надобности, не
+    больше readers одновременно.
+    """
+
+    def __init__(self, db_name, readers=READER_POOL_SIZE):
+        if readers < 1:
+            raise ValueError("Нужно хотя бы одно соединение для чтения")
+        self.db_name = db_name
+        self.readers = readers
+
+        self.writer = self.connect(readonly=False)
+        # Режим журнала хранится в файле базы, остальные соединения подхватят его сами
+        self.writer.execute("PRAGMA journal_mode = WAL")
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def connect(self, readonly=True):
+        """Новое соединение с настройками CONNECTION_PRAGMAS (по умолчанию только для чтения)"""
+        if readonly:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_name))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        for name, value in CONNECTION_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Соединение только для чтения из пула (ждет, пока освободится, если все заняты)"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.readers
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self.connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+
+        try:
+            yield conn
+        finally:
+            # Незавершенное чтение держало бы старый снимок базы
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        """Закрытие соединения записи и свободных соединений пула"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self.writer.close()
+
+
+class TablePager:
+    """Постраничное чтение таблицы по rowid (keyset) для Treeview.
+
+    Запросы выполняются в отдельном потоке на соединениях только для
+    чтения из пула ConnectionManager (соединение берется на время одной
+    страницы), page() сразу возвращает Future, и поток Tk не ждет чтения. После
+    загрузки страницы следующая страница в том же направлении сразу
+    запрашивается в фоне, поэтому при прокрутке она обычно уже готова.
+    """
+
+    def __init__(self, db, table, page_size=TREE_PAGE_SIZE):
+        self.db = db
+        self.table = table
+        self.page_size = page_size
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetched = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, key, backward):
+        """Строки (rowid, *значения) после key или, при backward, перед key"""
+        if key is None:
+            query = f"SELECT rowid, * FROM {self.table} ORDER BY rowid LIMIT ?"
+            params = (self.page_size,)
+        elif backward:
+            query = f"SELECT rowid, * FROM {self.table} WHERE rowid < ? ORDER BY rowid DESC LIMIT ?"
+            params = (key, self.page_size)
+        else:
+            query = f"SELECT rowid, * FROM {self.table} WHERE rowid > ? ORDER BY rowid LIMIT ?"
+            params = (key, self.page_size)
+
+        with self.db.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+        if backward:
+            rows.reverse()
+        return rows
+
+    def page(self, key=None, backward=False):
+        """Future страницы после key (или перед key при backward); None - первая страница"""
+        with self._lock:
+            future = self._prefetched.pop((key, backward), None)
+            # Остальные заранее загруженные страницы больше не понадобятся
+            self._clear()
+        if future is None:
+            future = self.executor.submit(self._fetch, key, backward)
+        future.add_done_callback(lambda done: self._prefetch(done, backward))
+        return future
+
+    def _prefetch(self, future, backward):
+        """Подгрузка следующей страницы в том же направлении после загрузки текущей"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        rows = future.result()
+        if len(rows) == self.page_size:
+            next_key = rows[0][0] if backward else rows[-1][0]
+            with self._lock:
+                if (next_key, backward) not in self._prefetched:
+                    try:
+                        self._prefetched[(next_key, backward)] = self.executor.submit(self._fetch, next_key, backward)
+                    except RuntimeError:
+                        # Пейджер уже закрыт
+                        pass
+
+    def _clear(self):
+        for stale in self._prefetched.values():
+            stale.cancel()
+        self._prefetched.clear()
+
+    def invalidate(self):
+        """Сброс заранее загруженной страницы (после изменения данных)"""
+        with self._lock:
+            self._clear()
+
+    def close(self):
+        """Закрытие без ожидания: уже начатый запрос вернет соединение в пул сам"""
+        with self._lock:
+            self._clear()
+            self.executor.shutdown(wait=False)
+
+
+class QueryJob:
+    """Задание для QueryExecutor"""
+
+    def __init__(self, work, on_done, on_error, description, on_progress=None):
+        self.work = work
+        self.on_done = on_done
+        self.on_error = on_error
+        self.description = description
+        self.on_progress = on_progress
+        self.cancelled = False
+
+
+class QueryExecutor:
+    """Выполнение запросов в рабочих потоках.
+
+    work(conn) выполняется в отдельном потоке, результат попадает в
+    очередь, которую поток Tk опрашивает через root.after, и передается в
+    on_done (или исключение - в on_error) уже в потоке Tk. Изменения
+    выполняются по очереди одним потоком на соединении записи
+    ConnectionManager, задания только на чтение (readonly=True) - сразу
+    несколькими потоками на соединениях из пула читателей, поэтому отчеты
+    не ждут долгих изменений. cancel() прерывает выполняющиеся запросы
+    через interrupt() и отменяет ожидающие задания. Долгие задания сообщают
+    о ходе выполнения через report_progress(), данные передаются в
+    on_progress в потоке Tk.
+    """
+
+    def __init__(self, root, db, on_busy=None, poll_ms=QUERY_POLL_MS):
+        self.root = root
+        self.db = db
+        self.on_busy = on_busy
+        self.poll_ms = poll_ms
+
+        self.tasks = queue.Queue()
+        self.read_tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.updates = queue.Queue()
+        self.pending = 0
+        # Выполняющиеся задания и их соединения
+        self.running = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.threads = [threading.Thread(target=self._writer, daemon=True)]
+        self.threads += [threading.Thread(target=self._reader, daemon=True) for _ in range(db.readers)]
+        for thread in self.threads:
+            thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, work, on_done=None, on_error=None, description="", on_progress=None, readonly=False):
+        """Постановка запроса в очередь (вызывается из потока Tk)"""
+        job = QueryJob(work, on_done, on_error, description, on_progress)
+        self.pending += 1
+        if self.on_busy:
+            self.on_busy(description)
+        (self.read_tasks if readonly else self.tasks).put(job)
+        return job
+
+    def _writer(self):
+        while (job := self.tasks.get()) is not None:
+            self._run(job, self.db.writer)
+
+    def _reader(self):
+        while (job := self.read_tasks.get()) is not None:
+            with self.db.reader() as conn:
+                self._run(job, conn)
+
+    def _run(self, job, conn):
+        with self._lock:
+            if job.cancelled:
+                self.results.put((job, None, sqlite3.OperationalError("interrupted")))
+                return
+            self.running[job] = conn
+        self._local.job = job
+
+        try:
+            result, error = job.work(conn), None
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            result, error = None, e
+        finally:
+            self._local.job = None
+            with self._lock:
+                del self.running[job]
+        self.results.put((job, result, error))
+
+    def report_progress(self, *args):
+        """Передача хода выполнения текущего задания в on_progress(*args).
+
+        Вызывается из work в рабочем потоке и заодно служит точкой отмены:
+        если задание отменено, выбрасывается OperationalError("interrupted").
+        """
+        job = getattr(self._local, 'job', None)
+        if job is None:
+            return
+        if job.cancelled:
+            raise sqlite3.OperationalError("interrupted")
+        if job.on_progress:
+            self.updates.put((job, args))
+
+    def _poll(self):
+        """Передача готовых результатов обработчикам в потоке Tk"""
+        while True:
+            try:
+                job, args = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            if not job.cancelled:
+                job.on_progress(*args)
+
+        while True:
+            try:
+                job, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending -= 1
+            if error is None:
+                if job.on_done:
+                    job.on_done(result)
+            elif job.on_error:
+                job.on_error(error)
+
+            if self.on_busy and self.pending == 0:
+                self.on_busy(None)
+
+        self.root.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        """Отмена всех заданий и прерывание выполняющихся запросов"""
+        with self._lock:
+            for tasks in (self.tasks, self.read_tasks):
+                while True:
+                    try:
+                        job = tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    job.cancelled = True
+                    self.results.put((job, None, sqlite3.OperationalError("interrupted")))
+            for job, conn in self.running.items():
+                job.cancelled = True
+                conn.interrupt()
+
+    def close(self):
+        self.cancel()
+        self.tasks.put(None)
+        for _ in range(self.db.readers):
+            self.read_tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+def is_interrupted(error):
+    """Запрос был прерван отменой"""
+    return isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error)
+
+
+class SchemaCatalog:
+    """Кэш метаданных схемы: столбцы, первичные и внешние ключи всех таблиц.
+
+    Метаданные читаются один раз тремя запросами через табличные функции
+    pragma_table_info и pragma_foreign_key_list. Кэш сбрасывается методом
+    invalidate() после DDL, а check() перечитывает его, если PRAGMA
+    schema_version изменилась (например, схему изменил другой процесс).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.version = None
+        self.tables = []
+        self._columns = {}
+        self._foreign_keys = {}
+        self._indexes = {}
+
+    def load(self):
+        self.version = self.conn.execute("PRAGMA schema_version").fetchone()[0]
+        self.tables = [row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence' ORDER BY rowid")]
+
+        self._columns = {table.lower(): [] for table in self.tables}
+        for table, *column in self.conn.execute('''
+            SELECT m.name, p.cid, p.name, p.type, p."notnull", p.dflt_value, p.pk
+            FROM sqlite_master m, pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND m.name != 'sqlite_sequence'
+            ORDER BY m.name, p.cid
+        '''):
+            self._columns[table.lower()].append(tuple(column))
+
+        self._foreign_keys = {table.lower(): [] for table in self.tables}
+        for table, *fk in self.conn.execute('''
+            SELECT m.name, f.id, f.seq, f."table", f."from", f."to", f.on_update, f.on_delete, f."match"
+            FROM sqlite_master m, pragma_foreign_key_list(m.name) f
+            WHERE m.type = 'table' AND m.name != 'sqlite_sequence'
+            ORDER BY m.name, f.id, f.seq
+        '''):
+            self._foreign_keys[table.lower()].append(tuple(fk))
+
+        self._indexes = {table.lower(): {} for table in self.tables}
+        for table, name, unique, column in self.conn.execute('''
+            SELECT m.name, l.name, l."unique", i.name
+            FROM sqlite_master m, pragma_index_list(m.name) l, pragma_index_info(l.name) i
+            WHERE m.type = 'table' AND m.name != 'sqlite_sequence'
+            ORDER BY m.name, l.name, i.seqno
+        '''):
+            self._indexes[table.lower()].setdefault(name, (name, unique, []))[2].append(column)
+
+    def _ensure_loaded(self):
+        if self.version is None:
+            self.load()
+
+    def invalidate(self):
+        self.version = None
+
+    def check(self):
+        """Перечитывание кэша, если схема изменилась с момента загрузки"""
+        if self.version is None or self.conn.execute("PRAGMA schema_version").fetchone()[0] != self.version:
+            self.load()
+
+    def table_names(self):
+        self._ensure_loaded()
+        return list(self.tables)
+
+    def columns(self, table):
+        """Столбцы в формате PRAGMA table_info: (cid, name, type, notnull, dflt_value, pk)"""
+        self._ensure_loaded()
+        return self._columns.get(table.lower(), [])
+
+    def column_names(self, table):
+        return [column[1] for column in self.columns(table)]
+
+    def primary_key(self, table):
+        """Имя столбца первичного ключа (первого, если ключ составной) или None"""
+        for column in self.columns(table):
+            if column[5]:
+                return column[1]
+        return None
+
+    def foreign_keys(self, table):
+        """Внешние ключи в формате PRAGMA foreign_key_list"""
+        self._ensure_loaded()
+        return self._foreign_keys.get(table.lower(), [])
+
+    def indexes(self, table):
+        """Индексы таблицы: (имя, уникальный, [столбцы]); столбец-выражение - None"""
+        self._ensure_loaded()
+        return list(self._indexes.get(table.lower(), {}).values())
+
+
+def table_row_estimates(conn):
+    """Оценка числа строк таблиц по sqlite_stat1 (заполняется ANALYZE): таблица -> строки"""
+    try:
+        rows = conn.execute("SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl").fetchall()
+    except sqlite3.OperationalError:
+        # ANALYZE еще не выполнялся
+        return {}
+    return {table.lower(): count for table, count in rows}
+
+
+class RelationshipGraph:
+    """Граф внешних ключей схемы и советы по индексам для них.
+
+    Строится один раз по кэшу SchemaCatalog. Ребро - внешний ключ в виде
+    (таблица, столбцы, родительская таблица, столбцы родителя, ON DELETE).
+    Внешний ключ без индекса, начинающегося с его столбцов, замедляет
+    соединения по нему, а изменение или удаление строки родителя
+    (проверка ключа, каскад) читает дочернюю таблицу целиком.
+    """
+
+    def __init__(self, schema, row_counts=None):
+        self.schema = schema
+        self.row_counts = row_counts or {}
+        self.edges = []
+        for table in schema.table_names():
+            keys = {}
+            for fk_id, seq, ref_table, from_col, to_col, on_update, on_delete, match in schema.foreign_keys(table):
+                key = keys.setdefault(fk_id, (ref_table, on_delete, [], []))
+                key[2].append(from_col)
+                # Без столбцов родителя ключ ссылается на его первичный ключ
+                key[3].append(to_col or schema.primary_key(ref_table))
+            for ref_table, on_delete, columns, ref_columns in keys.values():
+                self.edges.append((table, tuple(columns), ref_table, tuple(ref_columns), on_delete))
+
+    def references(self, table):
+        """Внешние ключи таблицы"""
+        return [edge for edge in self.edges if edge[0].lower() == table.lower()]
+
+    def referenced_by(self, table):
+        """Внешние ключи других таблиц, ссылающиеся на таблицу"""
+        return [edge for edge in self.edges if edge[2].lower() == table.lower()]
+
+    def find(self, table, column):
+        """Внешний ключ по одному столбцу column таблицы или None"""
+        for edge in self.references(table):
+            if [name.lower() for name in edge[1]] == [column.lower()]:
+                return edge
+        return None
+
+    def has_index(self, table, columns):
+        """Есть ли индекс, первые столбцы которого - columns (в любом порядке)"""
+        wanted = {column.lower() for column in columns}
+        if len(columns) == 1:
+            # Столбец INTEGER PRIMARY KEY - это сам rowid
+            for column in self.schema.columns(table):
+                if column[1].lower() in wanted and column[5] and column[2].upper() == 'INTEGER':
+                    return True
+        for name, unique, index_columns in self.schema.indexes(table):
+            leading = index_columns[:len(columns)]
+            if None not in leading and {column.lower() for column in leading} == wanted:
+                return True
+        return False
+
+    def is_unique_key(self, table, column):
+        """Может ли столбец быть родительским ключом (первичный ключ или уникальный индекс)"""
+        if [info[1].lower() for info in self.schema.columns(table) if info[5]] == [column.lower()]:
+            return True
+        return any(unique and [name.lower() for name in index_columns if name] == [column.lower()]
+                   for name, unique, index_columns in self.schema.indexes(table))
+
+    def row_count(self, table):
+        """Оценка числа строк по статистике или None"""
+        return self.row_counts.get(table.lower())
+
+    def missing_indexes(self):
+        """Внешние ключи без поддерживающего индекса, начиная с самых больших таблиц"""
+        missing = [edge for edge in self.edges if not self.has_index(edge[0], edge[1])]
+        return sorted(missing, key=lambda edge: -(self.row_count(edge[0]) or 0))
+
+    @staticmethod
+    def index_sql(table, columns):
+        """Запрос создания индекса для внешнего ключа"""
+        return (f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(columns)}_fk "
+                f"ON {table} ({', '.join(columns)})")
+
+
+class NameIndex:
+    """Поиск названий по началу строки без учета регистра.
+
+    Названия хранятся в списке, отсортированном по casefold, поэтому
+    совпадения с префиксом идут подряд и находятся через bisect за
+    O(log n), без перебора всего справочника.
+    """
+
+    def __init__(self, rows=()):
+        """rows - пары (id, название)"""
+        self.entries = sorted((name.casefold(), name, row_id) for row_id, name in rows if name is not None)
+        self.keys = [entry[0] for entry in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, prefix, limit=NAME_PICKER_LIMIT):
+        """Первые limit пар (id, название), начинающихся с prefix"""
+        key = prefix.casefold()
+        result = []
+        for index in range(bisect.bisect_left(self.keys, key), len(self.entries)):
+            if len(result) == limit or not self.keys[index].startswith(key):
+                break
+            result.append((self.entries[index][2], self.entries[index][1]))
+        return result
+
+    def find(self, name):
+        """id записи с точно таким названием (без учета регистра) или None"""
+        matches = self.search(name, limit=1)
+        if matches and matches[0][1].casefold() == name.casefold():
+            return matches[0][0]
+        return None
+
 
 class HospitalDBApp:
     def __init__(self, root):
@@ -9,98 +1386,57 @@ class HospitalDBApp:
         self.root.title("Система управления базой данных 'Больница'")
         self.root.geometry("1000x700")
 
-        # Подключение к базе данных
-        self.conn = sqlite3.connect('hospital.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        # Подключение к базе данных: изменения идут через соединение записи,
+        # метаданные схемы для интерфейса читаются через отдельное соединение
+        self.db = ConnectionManager(DB_NAME)
+
+        # Постраничная загрузка открытой таблицы
+        self.pager = None
+        self.tree_at_start = True
+        self.tree_at_end = True
+        self.tree_loading = False
+
+        # Справочники названий для выбора в отчетах: таблица -> NameIndex
+        self.name_indexes = {}
 
         # Создание структуры базы данных, если она не существует
         self.create_database_structure()
+        self.conn = self.db.connect()
+        self.schema = SchemaCatalog(self.conn)
 
         # Создание интерфейса
         self.create_interface()
 
+        # Фоновое выполнение отчетов и изменений данных
+        self.executor = QueryExecutor(self.root, self.db, on_busy=self.on_query_busy)
+
     def create_database_structure(self):
         """Создание структуры базы данных"""
         try:
-            # Таблица отделений
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS departments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT
-                )
-            ''')
-
-            # Таблица спонсоров
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sponsors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_name TEXT NOT NULL,
-                    contact_person TEXT,
-                    phone TEXT
-                )
-            ''')
-
-            # Таблица палат
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS wards (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    department_id INTEGER,
-                    capacity INTEGER,
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
-
-            # Таблица врачей
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS doctors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    first_name TEXT NOT NULL,
-                    last_name TEXT NOT NULL,
-                    specialization TEXT,
-                    salary_base REAL,
-                    salary_bonus REAL,
-                    department_id INTEGER,
-                    on_vacation BOOLEAN DEFAULT 0,
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
-
-            # Таблица пожертвований
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS donations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sponsor_id INTEGER,
-                    department_id INTEGER,
-                    amount REAL,
-                    donation_date DATE,
-                    FOREIGN KEY (sponsor_id) REFERENCES sponsors (id),
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
-
-            # Таблица обследований
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS examinations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    doctor_id INTEGER,
-                    department_id INTEGER,
-                    patient_name TEXT,
-                    examination_date DATE,
-                    diagnosis TEXT,
-                    FOREIGN KEY (doctor_id) REFERENCES doctors (id),
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
-
-            self.conn.commit()
+            create_schema(self.db.writer)
+
+            # Помесячные итоги пожертвований, сводка зарплат и индексы для отчетов
+            create_donation_rollup(self.db.writer)
+            create_payroll_summary(self.db.writer)
+            create_report_indexes(self.db.writer)
 
         except sqlite3.Error as e:
             messagebox.showerror("Ошибка базы данных", f"Ошибка при создании структуры БД: {e}")
 
     def create_interface(self):
         """Создание графического интерфейса"""
+        # Строка состояния фоновых запросов
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 10))
+
+        self.status_var = tk.StringVar(value="Готово")
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side='left', padx=5)
+        self.cancel_button = ttk.Button(status_frame, text="Отменить запрос", command=self.cancel_queries,
+                                        state='disabled')
+        self.cancel_button.pack(side='right', padx=5)
+        self.progress = ttk.Progressbar(status_frame, mode='indeterminate', length=200)
+        self.progress.pack(side='right', padx=5)
+
         # Создание вкладок
         notebook = ttk.Notebook(self.root)
         notebook.pack(fill='both', expand=True, padx=10, pady=10)
@@ -148,6 +1484,8 @@ class HospitalDBApp:
         ttk.Button(button_frame, text="Обновить все записи", command=self.update_all_records).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Удалить все записи", command=self.delete_all_records).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Обновить данные", command=self.refresh_data).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Импорт CSV", command=self.import_csv).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Экспорт CSV", command=self.export_csv).pack(side='left', padx=5)
 
         # Таблица для отображения данных
         tree_frame = ttk.Frame(parent)
@@ -157,9 +1495,9 @@ class HospitalDBApp:
         self.tree.pack(side='left', fill='both', expand=True)
 
         # Полосы прокрутки для таблицы
-        scrollbar_y = ttk.Scrollbar(tree_frame, orient='vertical', command=self.tree.yview)
-        scrollbar_y.pack(side='right', fill='y')
-        self.tree.configure(yscrollcommand=scrollbar_y.set)
+        self.tree_scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=self.tree.yview)
+        self.tree_scrollbar.pack(side='right', fill='y')
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
 
         scrollbar_x = ttk.Scrollbar(parent, orient='horizontal', command=self.tree.xview)
         scrollbar_x.pack(side='bottom', fill='x')
@@ -176,7 +1514,16 @@ class HospitalDBApp:
         ttk.Button(button_frame, text="Показать связи", command=self.show_relationships).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Создать таблицу", command=self.create_table).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Удалить таблицу", command=self.drop_table).pack(side='left', padx=5)
-        ttk.Button(button_frame, text="Добавить столбец", command=self.add_column).pack(side='left', padx=5)
+
+        # Изменения столбцов и связей (с перестройкой таблицы)
+        alter_frame = ttk.Frame(parent)
+        alter_frame.pack(fill='x', padx=5, pady=(0, 5))
+
+        ttk.Button(alter_frame, text="Добавить столбец", command=self.add_column).pack(side='left', padx=5)
+        ttk.Button(alter_frame, text="Изменить столбец", command=self.update_column).pack(side='left', padx=5)
+        ttk.Button(alter_frame, text="Удалить столбец", command=self.delete_column).pack(side='left', padx=5)
+        ttk.Button(alter_frame, text="Добавить внешний ключ", command=self.add_foreign_key).pack(side='left', padx=5)
+        ttk.Button(alter_frame, text="Удалить внешний ключ", command=self.drop_foreign_key).pack(side='left', padx=5)
 
         # Область для вывода информации
         text_frame = ttk.Frame(parent)
@@ -209,6 +1556,14 @@ class HospitalDBApp:
         ttk.Button(reports_frame, text="Врачи и отделения",
                    command=self.report_doctors_departments).pack(side='left', padx=5)
 
+        # Продолжение постраничных отчетов
+        self.report_more = None
+        self.report_generation = 0
+        self.report_shown = 0
+        self.report_more_button = ttk.Button(reports_frame, text="Следующая страница",
+                                             command=self.next_report_page, state='disabled')
+        self.report_more_button.pack(side='right', padx=5)
+
         # Область для вывода отчетов
         text_frame = ttk.Frame(parent)
         text_frame.pack(fill='both', expand=True, padx=5, pady=5)
@@ -221,6 +1576,208 @@ class HospitalDBApp:
         scrollbar.pack(side='right', fill='y')
         self.reports_text.configure(yscrollcommand=scrollbar.set)
 
+    def on_query_busy(self, description):
+        """Индикация выполнения фоновых запросов"""
+        if description is None:
+            self.progress.stop()
+            self.cancel_button.configure(state='disabled')
+            if not self.status_var.get().startswith("Запрос отменен"):
+                self.status_var.set("Готово")
+        else:
+            self.progress.configure(mode='indeterminate')
+            self.progress.start(10)
+            self.cancel_button.configure(state='normal')
+            self.status_var.set(f"Выполняется: {description}")
+
+    def on_query_progress(self, description, done, total):
+        """Индикация хода долгой операции с известным объемом"""
+        self.progress.stop()
+        self.progress.configure(mode='determinate', maximum=max(total, 1), value=done)
+        self.status_var.set(f"Выполняется: {description} ({done} из {total})")
+
+    def cancel_queries(self):
+        """Отмена выполняющихся запросов"""
+        self.executor.cancel()
+        self.status_var.set("Запрос отменен")
+
+    def run_query(self, work, on_done, error_message, description="", readonly=False):
+        """Выполнение work(conn) в фоне, on_done(result) вызывается в потоке Tk.
+
+        readonly - work только читает и может идти параллельно с изменениями.
+        """
+        def on_error(e):
+            if not is_interrupted(e):
+                messagebox.showerror("Ошибка", f"{error_message}: {e}")
+
+        self.executor.submit(work, on_done, on_error, description, readonly=readonly)
+
+    def run_report(self, query, params, render, description):
+        """Выполнение запроса отчета в фоне и вывод результата через render(rows)"""
+        self.run_query(lambda conn: conn.execute(query, params).fetchall(), render,
+                       "Ошибка при формировании отчета", description, readonly=True)
+
+    def run_batched(self, work, on_done, error_message, description, on_cancel=None):
+        """Пакетная операция work(conn, batch_size, progress) в фоне с ходом выполнения и отменой"""
+        batch_size = simpledialog.askinteger("Размер пачки", "Число строк в одной транзакции:",
+                                             initialvalue=MASS_CHANGE_BATCH_SIZE, minvalue=1)
+        if not batch_size:
+            return
+
+        def on_progress(done, total):
+            self.on_query_progress(description, done, total)
+
+        def on_error(e):
+            if not is_interrupted(e):
+                messagebox.showerror("Ошибка", f"{error_message}: {e}")
+            elif on_cancel:
+                on_cancel()
+
+        self.executor.submit(lambda conn: work(conn, batch_size, self.executor.report_progress),
+                             on_done, on_error, description, on_progress)
+
+    def run_batched_write(self, table_name, statement, params, message, error_message, description, vacuum=False):
+        """Массовое изменение таблицы пачками в фоне с ходом выполнения и отменой"""
+        def work(conn, batch_size, progress):
+            return change_in_batches(conn, table_name, statement, params, batch_size, progress, vacuum)
+
+        # При отмене зафиксированные пачки остаются, показываем текущее состояние
+        self.run_batched(work, lambda changed: self.on_data_changed(table_name, f"{message}: {changed}"),
+                         error_message, description,
+                         lambda: self.on_data_changed(table_name, "Операция прервана, часть записей уже изменена"))
+
+    def import_csv(self):
+        """Загрузка всех таблиц из файлов <таблица>.csv выбранного каталога"""
+        directory = filedialog.askdirectory(title="Каталог с файлами CSV")
+        if not directory:
+            return
+        replace = messagebox.askyesnocancel("Импорт CSV", "Удалить существующие строки загружаемых таблиц?")
+        if replace is None:
+            return
+
+        def on_done(stats):
+            self.invalidate_names()
+            lines = [f"{table}: {stats[table]}" for table in TRANSFER_TABLES if table in stats]
+            if stats['fk_violations']:
+                lines.append(f"Строк с нарушением внешних ключей: {stats['fk_violations']}")
+            lines.append(f"Время: {stats['seconds']:.2f} с, скорость: {stats['rows_per_sec']:,.0f} строк/с")
+            messagebox.showinfo("Импорт CSV", "Загружено строк:\n" + "\n".join(lines))
+            if self.table_var.get():
+                self.display_table_data(self.table_var.get())
+
+        self.run_transfer(lambda conn, progress: import_tables(conn, directory, replace=replace, progress=progress),
+                          on_done, "Не удалось загрузить данные", "Импорт CSV")
+
+    def export_csv(self):
+        """Выгрузка всех таблиц в файлы <таблица>.csv выбранного каталога"""
+        directory = filedialog.askdirectory(title="Каталог для файлов CSV")
+        if not directory:
+            return
+
+        def on_done(stats):
+            total = sum(stats[table] for table in TRANSFER_TABLES)
+            messagebox.showinfo("Экспорт CSV", f"Выгружено строк: {total} в каталог {directory}\n"
+                                               f"Время: {stats['seconds']:.2f} с, "
+                                               f"скорость: {stats['rows_per_sec']:,.0f} строк/с")
+
+        self.run_transfer(lambda conn, progress: export_tables(conn, directory, progress=progress),
+                          on_done, "Не удалось выгрузить данные", "Экспорт CSV", readonly=True)
+
+    def run_transfer(self, work, on_done, error_message, description, readonly=False):
+        """Импорт или экспорт work(conn, progress) в фоне; при отмене импорт откатывается целиком"""
+        def on_progress(done, total):
+            self.on_query_progress(description, done, total)
+
+        def on_error(e):
+            if is_interrupted(e):
+                messagebox.showinfo(description, "Операция прервана")
+            else:
+                messagebox.showerror("Ошибка", f"{error_message}: {e}")
+
+        self.executor.submit(lambda conn: work(conn, self.executor.report_progress),
+                             on_done, on_error, description, on_progress, readonly)
+
+    def start_report(self, title):
+        """Очистка области отчета и вывод заголовка; возвращает номер отчета для render_page"""
+        self.report_generation += 1
+        self.report_shown = 0
+        self.reports_text.delete(1.0, tk.END)
+        self.reports_text.insert(tk.END, title)
+        self.set_report_more(None)
+        return self.report_generation
+
+    def render_page(self, generation, rows, format_row, load_next=None, footer=""):
+        """Вывод страницы отчета кусками по REPORT_CHUNK_ROWS строк.
+
+        Каждый кусок вставляется в Text одним вызовом insert, между кусками
+        Tk обрабатывает события. load_next - загрузка следующей страницы по
+        кнопке, footer выводится после последней страницы. Страницы
+        отчета, замененного новым (другой generation), не выводятся.
+        """
+        def insert_chunk(start):
+            if generation != self.report_generation:
+                return
+            chunk = rows[start:start + REPORT_CHUNK_ROWS]
+            self.reports_text.insert(tk.END, ''.join(format_row(row) for row in chunk))
+            self.report_shown += len(chunk)
+
+            if start + REPORT_CHUNK_ROWS < len(rows):
+                self.root.after_idle(insert_chunk, start + REPORT_CHUNK_ROWS)
+            elif load_next:
+                self.reports_text.insert(tk.END, f"--- показано строк: {self.report_shown} ---\n")
+                self.set_report_more(load_next)
+            else:
+                self.reports_text.insert(tk.END, footer)
+
+        insert_chunk(0)
+
+    def run_paged_report(self, report, params, title, format_row, description, summary=None):
+        """Отчет REPORT_QUERIES[report] страницами по REPORT_PAGE_SIZE строк.
+
+        Следующая страница читается после ключа REPORT_PAGE_KEYS[report]
+        последней показанной строки (keyset_query), а не через OFFSET.
+        summary - (запрос итогов по всем строкам, функция текста итогов по
+        строкам этого запроса); итоги выводятся после последней страницы.
+        """
+        query = REPORT_QUERIES[report]
+        keys, positions, descending = REPORT_PAGE_KEYS[report]
+        next_query = keyset_query(query, keys, descending)
+
+        def load(after, generation):
+            def work(conn):
+                if after is None:
+                    rows = conn.execute(f"{query} LIMIT ?", (*params, REPORT_PAGE_SIZE + 1)).fetchall()
+                else:
+                    rows = conn.execute(next_query, (*params, after[0], *after, REPORT_PAGE_SIZE + 1)).fetchall()
+                totals = None
+                if summary and len(rows) <= REPORT_PAGE_SIZE:
+                    totals = conn.execute(summary[0], params).fetchall()
+                return rows, totals
+
+            def render(result):
+                rows, totals = result
+                current = self.start_report(title) if generation is None else generation
+                if len(rows) > REPORT_PAGE_SIZE:
+                    last = rows[REPORT_PAGE_SIZE - 1]
+                    self.render_page(current, rows[:REPORT_PAGE_SIZE], format_row,
+                                     lambda: load(tuple(last[i] for i in positions), current))
+                else:
+                    self.render_page(current, rows, format_row, footer=summary[1](totals) if summary else "")
+
+            self.run_query(work, render, "Ошибка при формировании отчета", description, readonly=True)
+
+        load(None, None)
+
+    def set_report_more(self, load_more):
+        """Загрузка следующей страницы отчета по кнопке; None - страниц больше нет"""
+        self.report_more = load_more
+        self.report_more_button.configure(state='normal' if load_more else 'disabled')
+
+    def next_report_page(self):
+        if self.report_more is not None:
+            load_more, self.report_more = self.report_more, None
+            self.report_more_button.configure(state='disabled')
+            load_more()
+
     def on_table_selected(self, event=None):
         """Обработчик выбора таблицы"""
         table_name = self.table_var.get()
@@ -231,21 +1788,22 @@ class HospitalDBApp:
         """Обновление данных таблицы"""
         table_name = self.table_var.get()
         if table_name:
+            self.schema.check()
             self.display_table_data(table_name)
         else:
             messagebox.showwarning("Предупреждение", "Выберите таблицу для обновления")
 
     def display_table_data(self, table_name):
-        """Отображение данных таблицы"""
+        """Отображение данных таблицы: загружается только первая страница"""
         try:
             # Очистка таблицы
-            for item in self.tree.get_children():
-                self.tree.delete(item)
+            if self.pager is not None:
+                self.pager.close()
+                self.pager = None
+            self.tree.delete(*self.tree.get_children())
 
             # Получение структуры таблицы
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = self.cursor.fetchall()
-            columns = [column[1] for column in columns_info]
+            columns = self.schema.column_names(table_name)
 
             # Настройка столбцов
             self.tree['columns'] = columns
@@ -253,16 +1811,174 @@ class HospitalDBApp:
                 self.tree.heading(col, text=col)
                 self.tree.column(col, width=100, minwidth=50)
 
-            # Получение данных
-            self.cursor.execute(f"SELECT * FROM {table_name}")
-            rows = self.cursor.fetchall()
+            # Получение первой страницы данных, остальные подгружаются при прокрутке
+            self.pager = TablePager(self.db, table_name)
+            self.tree_at_start = True
+            self.tree_at_end = False
+            self.tree_loading = True
+            self.load_next_page()
 
-            # Заполнение данными
-            for row in rows:
-                self.tree.insert('', 'end', values=row)
+        except sqlite3.Error as e:
+            messagebox.showerror("Ошибка", f"Ошибка при загрузке данных: {e}")
 
+    def on_tree_scroll(self, first, last):
+        """Подгрузка соседней страницы при подходе прокрутки к краю окна строк"""
+        self.tree_scrollbar.set(first, last)
+        if self.pager is None or self.tree_loading:
+            return
+
+        if float(last) >= 1 - TREE_SCROLL_EDGE and not self.tree_at_end:
+            self.tree_loading = True
+            self.root.after_idle(self.load_next_page)
+        elif float(first) <= TREE_SCROLL_EDGE and not self.tree_at_start:
+            self.tree_loading = True
+            self.root.after_idle(self.load_previous_page)
+
+    def load_next_page(self):
+        """Запрос следующей страницы; строки добавляются в конец, когда она загрузится"""
+        items = self.tree.get_children()
+        pager = self.pager
+        self.when_page_ready(pager, pager.page(int(items[-1]) if items else None), self.show_next_page)
+
+    def load_previous_page(self):
+        """Запрос предыдущей страницы; строки добавляются в начало, когда она загрузится"""
+        items = self.tree.get_children()
+        pager = self.pager
+        self.when_page_ready(pager, pager.page(int(items[0]) if items else None, backward=True),
+                             self.show_previous_page)
+
+    def when_page_ready(self, pager, future, show):
+        """Вызов show(rows) в потоке Tk после загрузки страницы (опрос через root.after).
+
+        Страницы пейджера, замененного другой таблицей, не выводятся.
+        """
+        if pager is not self.pager:
+            return
+        if not future.done():
+            self.root.after(QUERY_POLL_MS, self.when_page_ready, pager, future, show)
+            return
+
+        self.tree_loading = False
+        try:
+            rows = future.result()
         except sqlite3.Error as e:
             messagebox.showerror("Ошибка", f"Ошибка при загрузке данных: {e}")
+            return
+        show(rows)
+
+    def show_next_page(self, rows):
+        """Добавление следующей страницы в конец, лишние строки сверху удаляются"""
+        items = self.tree.get_children()
+        self.tree_at_end = len(rows) < self.pager.page_size
+
+        for rowid, *values in rows:
+            # Строка могла появиться раньше страницы (добавлена через update_tree_row)
+            if not self.tree.exists(rowid):
+                self.tree.insert('', 'end', iid=rowid, values=values)
+
+        excess = len(items) + len(rows) - TREE_PAGE_SIZE * TREE_WINDOW_PAGES
+        if excess > 0:
+            self.tree.delete(*items[:excess])
+            # Удаление строк над видимой областью сдвигает ее вниз, возвращаем обратно
+            self.tree.yview_scroll(-excess, 'units')
+            self.tree_at_start = False
+
+    def show_previous_page(self, rows):
+        """Добавление предыдущей страницы в начало, лишние строки снизу удаляются"""
+        items = self.tree.get_children()
+        self.tree_at_start = len(rows) < self.pager.page_size
+
+        rows = [row for row in rows if not self.tree.exists(row[0])]
+        for index, (rowid, *values) in enumerate(rows):
+            self.tree.insert('', index, iid=rowid, values=values)
+        self.tree.yview_scroll(len(rows), 'units')
+
+        excess = len(items) + len(rows) - TREE_PAGE_SIZE * TREE_WINDOW_PAGES
+        if excess > 0:
+            self.tree.delete(*items[-excess:])
+            self.tree_at_end = False
+
+    def on_data_changed(self, table_name, message):
+        """Сообщение об успешном изменении и обновление открытой таблицы"""
+        self.invalidate_names(table_name)
+        messagebox.showinfo("Успех", message)
+        if self.table_var.get() == table_name:
+            self.display_table_data(table_name)
+
+    def invalidate_names(self, table_name=None):
+        """Сброс справочника названий после изменения таблицы (None - всех)"""
+        if table_name is None:
+            self.name_indexes.clear()
+        else:
+            self.name_indexes.pop(table_name.lower(), None)
+
+    def with_name_index(self, table_name, callback):
+        """Вызов callback(NameIndex) со справочником таблицы, загружая его в фоне при необходимости"""
+        index = self.name_indexes.get(table_name)
+        if index is not None:
+            callback(index)
+            return
+
+        def on_done(index):
+            self.name_indexes[table_name] = index
+            callback(index)
+
+        self.run_query(lambda conn: NameIndex(conn.execute(NAME_INDEX_QUERIES[table_name]).fetchall()),
+                       on_done, "Ошибка при загрузке справочника", f"справочник {table_name}", readonly=True)
+
+    def run_row_write(self, table_name, query, params, rowid, message, error_message, description):
+        """Изменение одной строки в фоне с точечным обновлением таблицы.
+
+        rowid - изменяемая строка, None - вставка (берется lastrowid).
+        После записи строка перечитывается по rowid, и в Treeview меняется
+        только ее элемент, без перезагрузки таблицы.
+        """
+        def work(conn):
+            cursor = conn.execute(query, params)
+            conn.commit()
+            key = cursor.lastrowid if rowid is None else rowid
+            return key, conn.execute(f"SELECT rowid, * FROM {table_name} WHERE rowid = ?", (key,)).fetchone()
+
+        def on_done(result):
+            key, row = result
+            self.invalidate_names(table_name)
+            if self.table_var.get() == table_name and self.pager is not None:
+                self.pager.invalidate()
+                self.update_tree_row(key, row)
+            messagebox.showinfo("Успех", message)
+
+        self.run_query(work, on_done, error_message, description)
+
+    def update_tree_row(self, rowid, row):
+        """Вставка, замена или удаление (row=None) одного элемента Treeview.
+
+        Новая строка показывается, только если попадает в загруженное окно
+        строк; иначе она появится при прокрутке.
+        """
+        iid = str(rowid)
+        if row is None:
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+            return
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=row[1:])
+            return
+
+        items = self.tree.get_children()
+        if items and rowid > int(items[-1]):
+            if not self.tree_at_end:
+                return
+            index = 'end'
+        elif items and rowid < int(items[0]):
+            if not self.tree_at_start:
+                return
+            index = 0
+        else:
+            # Окно строк ограничено TREE_WINDOW_PAGES страницами, поиск места по нему
+            index = bisect.bisect_left([int(item) for item in items], rowid)
+        self.tree.insert('', index, iid=iid, values=row[1:])
+        self.tree.selection_set(iid)
+        self.tree.see(iid)
 
     def insert_record(self):
         """Вставка новой записи"""
@@ -273,8 +1989,7 @@ class HospitalDBApp:
 
         try:
             # Получение структуры таблицы
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = self.cursor.fetchall()
+            columns_info = self.schema.columns(table_name)
 
             # Создание диалога для ввода данных
             input_dialog = RecordInputDialog(self.root, columns_info, "Добавить запись")
@@ -286,11 +2001,8 @@ class HospitalDBApp:
                 placeholders = ['?' for _ in columns]
 
                 query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
-                self.cursor.execute(query, input_dialog.result)
-                self.conn.commit()
-
-                messagebox.showinfo("Успех", "Запись успешно добавлена")
-                self.display_table_data(table_name)
+                self.run_row_write(table_name, query, input_dialog.result, None, "Запись успешно добавлена",
+                                   "Ошибка при добавлении записи", "добавление записи")
 
         except sqlite3.Error as e:
             messagebox.showerror("Ошибка", f"Ошибка при добавлении записи: {e}")
@@ -309,8 +2021,7 @@ class HospitalDBApp:
 
         try:
             # Получение структуры таблицы
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = self.cursor.fetchall()
+            columns_info = self.schema.columns(table_name)
 
             # Получение текущих значений
             current_values = self.tree.item(selected_item[0])['values']
@@ -339,11 +2050,8 @@ class HospitalDBApp:
                 if primary_key_col and primary_key_value:
                     values.append(primary_key_value)
                     query = f"UPDATE {table_name} SET {', '.join(set_clause)} WHERE {primary_key_col} = ?"
-                    self.cursor.execute(query, values)
-                    self.conn.commit()
-
-                    messagebox.showinfo("Успех", "Запись успешно обновлена")
-                    self.display_table_data(table_name)
+                    self.run_row_write(table_name, query, values, int(selected_item[0]), "Запись успешно обновлена",
+                                       "Ошибка при обновлении записи", "обновление записи")
                 else:
                     messagebox.showerror("Ошибка", "Не удалось определить первичный ключ")
 
@@ -364,30 +2072,19 @@ class HospitalDBApp:
 
         if messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить выбранную запись?"):
             try:
-                # Получение структуры таблицы
-                self.cursor.execute(f"PRAGMA table_info({table_name})")
-                columns_info = self.cursor.fetchall()
-
                 # Поиск первичного ключа
-                primary_key_col = None
-                for col in columns_info:
-                    if col[5]:  # PRIMARY KEY
-                        primary_key_col = col[1]
-                        break
+                primary_key_col = self.schema.primary_key(table_name)
 
                 if primary_key_col:
                     # Получение значения первичного ключа
                     current_values = self.tree.item(selected_item[0])['values']
-                    primary_key_index = [col[1] for col in columns_info].index(primary_key_col)
+                    primary_key_index = self.schema.column_names(table_name).index(primary_key_col)
                     primary_key_value = current_values[primary_key_index]
 
                     # Удаление записи
                     query = f"DELETE FROM {table_name} WHERE {primary_key_col} = ?"
-                    self.cursor.execute(query, (primary_key_value,))
-                    self.conn.commit()
-
-                    messagebox.showinfo("Успех", "Запись успешно удалена")
-                    self.display_table_data(table_name)
+                    self.run_row_write(table_name, query, (primary_key_value,), int(selected_item[0]),
+                                       "Запись успешно удалена", "Ошибка при удалении записи", "удаление записи")
                 else:
                     messagebox.showerror("Ошибка", "Не удалось определить первичный ключ")
 
@@ -405,8 +2102,7 @@ class HospitalDBApp:
                                "Вы уверены, что хотите обновить ВСЕ записи в таблице? Это действие нельзя отменить."):
             try:
                 # Получение структуры таблицы
-                self.cursor.execute(f"PRAGMA table_info({table_name})")
-                columns_info = self.cursor.fetchall()
+                columns_info = self.schema.columns(table_name)
 
                 # Создание диалога для ввода новых значений
                 input_dialog = RecordInputDialog(self.root, columns_info, "Обновить все записи")
@@ -424,11 +2120,8 @@ class HospitalDBApp:
 
                     if set_clause:
                         query = f"UPDATE {table_name} SET {', '.join(set_clause)}"
-                        self.cursor.execute(query, values)
-                        self.conn.commit()
-
-                        messagebox.showinfo("Успех", "Все записи успешно обновлены")
-                        self.display_table_data(table_name)
+                        self.run_batched_write(table_name, query, values, "Обновлено записей",
+                                               "Ошибка при обновлении записей", "обновление всех записей")
                     else:
                         messagebox.showwarning("Предупреждение", "Не указаны данные для обновления")
 
@@ -444,27 +2137,20 @@ class HospitalDBApp:
 
         if messagebox.askyesno("Подтверждение",
                                "Вы уверены, что хотите удалить ВСЕ записи в таблице? Это действие нельзя отменить."):
-            try:
-                self.cursor.execute(f"DELETE FROM {table_name}")
-                self.conn.commit()
-
-                messagebox.showinfo("Успех", "Все записи успешно удалены")
-                self.display_table_data(table_name)
-
-            except sqlite3.Error as e:
-                messagebox.showerror("Ошибка", f"Ошибка при удалении записей: {e}")
+            self.run_batched_write(table_name, f"DELETE FROM {table_name}", (), "Удалено записей",
+                                   "Ошибка при удалении записей", "удаление всех записей", vacuum=True)
 
     # Методы для работы со структурой БД
     def show_tables(self):
         """Показать все таблицы"""
         try:
-            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence'")
-            tables = self.cursor.fetchall()
+            self.schema.check()
+            tables = self.schema.table_names()
 
             self.structure_text.delete(1.0, tk.END)
             self.structure_text.insert(tk.END, "Таблицы в базе данных:\n\n")
             for table in tables:
-                self.structure_text.insert(tk.END, f"- {table[0]}\n")
+                self.structure_text.insert(tk.END, f"- {table}\n")
 
         except sqlite3.Error as e:
             messagebox.showerror("Ошибка", f"Ошибка при получении списка таблиц: {e}")
@@ -474,8 +2160,7 @@ class HospitalDBApp:
         table_name = simpledialog.askstring("Ввод", "Введите название таблицы:")
         if table_name:
             try:
-                self.cursor.execute(f"PRAGMA table_info({table_name})")
-                columns = self.cursor.fetchall()
+                columns = self.schema.columns(table_name)
 
                 self.structure_text.delete(1.0, tk.END)
                 self.structure_text.insert(tk.END, f"Структура таблицы '{table_name}':\n\n")
@@ -493,35 +2178,173 @@ class HospitalDBApp:
                 messagebox.showerror("Ошибка", f"Ошибка при получении структуры таблицы: {e}")
 
     def show_relationships(self):
-        """Показать связи между таблицами"""
+        """Показать связи между таблицами и внешние ключи без индексов"""
         try:
-            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence'")
-            tables = self.cursor.fetchall()
+            self.schema.check()
+            tables = self.schema.table_names()
+        except sqlite3.Error as e:
+            messagebox.showerror("Ошибка", f"Ошибка при получении информации о связях: {e}")
+            return
 
-            self.structure_text.delete(1.0, tk.END)
-            self.structure_text.insert(tk.END, "Связи между таблицами:\n\n")
+        def work(conn):
+            # Оценки числа строк берутся из статистики; если у непустой таблицы ее нет, собираем
+            estimates = table_row_estimates(conn)
+            if any(table.lower() not in estimates
+                   and conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0] for table in tables):
+                conn.execute("ANALYZE")
+                conn.commit()
+                estimates = table_row_estimates(conn)
+            return estimates
+
+        self.run_query(work, self.render_relationships, "Ошибка при получении информации о связях",
+                       "анализ связей")
+
+    def render_relationships(self, row_counts):
+        graph = RelationshipGraph(self.schema, row_counts)
+
+        self.structure_text.delete(1.0, tk.END)
+        self.structure_text.insert(tk.END, "Связи между таблицами:\n\n")
+        if not graph.edges:
+            self.structure_text.insert(tk.END, "Связи между таблицами не найдены.\n")
+            return
 
-            has_relationships = False
-            for table in tables:
-                table_name = table[0]
+        for table in self.schema.table_names():
+            references, referenced_by = graph.references(table), graph.referenced_by(table)
+            if not references and not referenced_by:
+                continue
+            rows = graph.row_count(table)
+            self.structure_text.insert(tk.END, f"Таблица '{table}' (строк: {rows if rows is not None else '?'}):\n")
+            for child, columns, parent, ref_columns, on_delete in references:
+                index_info = "" if graph.has_index(child, columns) else "  [нет индекса]"
+                self.structure_text.insert(tk.END, f"  Связь: {', '.join(columns)} -> "
+                                                   f"{parent}({', '.join(ref_columns)}){index_info}\n")
+            for child, columns, parent, ref_columns, on_delete in referenced_by:
+                self.structure_text.insert(tk.END, f"  Ссылается: {child}({', '.join(columns)})"
+                                                   f", ON DELETE {on_delete}\n")
+            self.structure_text.insert(tk.END, "\n")
+
+        missing = graph.missing_indexes()
+        if not missing:
+            self.structure_text.insert(tk.END, "У всех внешних ключей есть индексы.\n")
+            return
 
-                self.cursor.execute(f"PRAGMA foreign_key_list({table_name})")
-                foreign_keys = self.cursor.fetchall()
+        self.structure_text.insert(tk.END, "Внешние ключи без индекса (соединения и удаление из родительской "
+                                           "таблицы читают дочернюю целиком):\n")
+        statements = []
+        for child, columns, parent, ref_columns, on_delete in missing:
+            rows = graph.row_count(child)
+            statements.append(graph.index_sql(child, columns))
+            self.structure_text.insert(tk.END, f"  {child}({', '.join(columns)}) -> {parent}, "
+                                               f"строк: {rows if rows is not None else '?'}\n"
+                                               f"    {statements[-1]}\n")
+
+        if messagebox.askyesno("Индексы", f"Создать недостающие индексы ({len(statements)})?"):
+            self.create_indexes(statements)
+
+    def create_indexes(self, statements):
+        """Создание индексов в фоне со сбором статистики"""
+        def work(conn):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute("ANALYZE")
+            conn.commit()
+
+        def on_done(result):
+            self.schema.invalidate()
+            messagebox.showinfo("Успех", f"Создано индексов: {len(statements)}")
+            self.show_relationships()
+
+        self.run_query(work, on_done, "Ошибка при создании индексов", "создание индексов")
+
+    def add_foreign_key(self):
+        """Добавление внешнего ключа (с перестройкой таблицы)"""
+        table_name = simpledialog.askstring("Добавление внешнего ключа", "Введите название таблицы:")
+        if not table_name:
+            return
+        column = simpledialog.askstring("Добавление внешнего ключа", "Введите название столбца:")
+        if not column:
+            return
+        ref_table = simpledialog.askstring("Добавление внешнего ключа", "Введите название родительской таблицы:")
+        if not ref_table:
+            return
 
-                if foreign_keys:
-                    has_relationships = True
-                    self.structure_text.insert(tk.END, f"Таблица '{table_name}':\n")
-                    for fk in foreign_keys:
-                        id, seq, fk_table, from_col, to_col, on_update, on_delete, match = fk
-                        self.structure_text.insert(tk.END,
-                                                   f"  Связь: {from_col} -> {fk_table}({to_col})\n")
-                    self.structure_text.insert(tk.END, "\n")
+        try:
+            self.schema.check()
+            graph = RelationshipGraph(self.schema)
+        except sqlite3.Error as e:
+            messagebox.showerror("Ошибка", f"Ошибка при получении информации о связях: {e}")
+            return
 
-            if not has_relationships:
-                self.structure_text.insert(tk.END, "Связи между таблицами не найдены.\n")
+        if column.lower() not in [name.lower() for name in self.schema.column_names(table_name)]:
+            messagebox.showerror("Ошибка", f"Столбец '{column}' не найден в таблице '{table_name}'")
+            return
+        if graph.find(table_name, column):
+            messagebox.showerror("Ошибка", f"У столбца '{column}' уже есть внешний ключ")
+            return
+        ref_column = simpledialog.askstring("Добавление внешнего ключа", "Введите столбец родительской таблицы:",
+                                            initialvalue=self.schema.primary_key(ref_table) or "")
+        if not ref_column:
+            return
+        if not graph.is_unique_key(ref_table, ref_column):
+            messagebox.showerror("Ошибка", f"Столбец '{ref_table}.{ref_column}' не является первичным ключом "
+                                           f"и не имеет уникального индекса")
+            return
+
+        def work(conn, batch_size, progress):
+            skipped = rebuild_table(conn, table_name, foreign_key_change(column, ref_table, ref_column),
+                                    batch_size, progress)
+            violations = conn.execute("SELECT COUNT(*) FROM pragma_foreign_key_check(?)", (table_name,)).fetchone()[0]
+            return skipped, violations
+
+        def on_done(result):
+            skipped, violations = result
+            self.schema.invalidate()
+            message = "Внешний ключ успешно добавлен"
+            if violations:
+                message += f". Строк, нарушающих ключ: {violations}"
+            if skipped:
+                message += f". Не удалось пересоздать: {', '.join(skipped)}"
+            messagebox.showinfo("Успех", message)
+
+            if not RelationshipGraph(self.schema).has_index(table_name, (column,)) and messagebox.askyesno(
+                    "Индексы", f"У столбца '{column}' нет индекса. Создать?"):
+                self.create_indexes([RelationshipGraph.index_sql(table_name, (column,))])
+            else:
+                self.show_relationships()
+
+        self.run_batched(work, on_done, "Ошибка при добавлении внешнего ключа", "добавление внешнего ключа")
+
+    def drop_foreign_key(self):
+        """Удаление внешнего ключа (с перестройкой таблицы)"""
+        table_name = simpledialog.askstring("Удаление внешнего ключа", "Введите название таблицы:")
+        if not table_name:
+            return
+        column = simpledialog.askstring("Удаление внешнего ключа", "Введите название столбца:")
+        if not column:
+            return
 
+        try:
+            self.schema.check()
+            edge = RelationshipGraph(self.schema).find(table_name, column)
         except sqlite3.Error as e:
             messagebox.showerror("Ошибка", f"Ошибка при получении информации о связях: {e}")
+            return
+        if edge is None:
+            messagebox.showerror("Ошибка", f"У столбца '{column}' таблицы '{table_name}' нет внешнего ключа")
+            return
+
+        if messagebox.askyesno("Подтверждение", f"Удалить связь {table_name}({column}) -> {edge[2]}?"):
+            def on_done(skipped):
+                self.schema.invalidate()
+                message = "Внешний ключ успешно удален"
+                if skipped:
+                    message += f". Не удалось пересоздать: {', '.join(skipped)}"
+                messagebox.showinfo("Успех", message)
+                self.show_relationships()
+
+            self.run_batched(lambda conn, batch_size, progress: rebuild_table(
+                                 conn, table_name, foreign_key_change(column), batch_size, progress),
+                             on_done, "Ошибка при удалении внешнего ключа", "удаление внешнего ключа")
 
     def create_table(self):
         """Создание новой таблицы"""
@@ -530,31 +2353,18 @@ class HospitalDBApp:
             columns_def = simpledialog.askstring("Создание таблицы",
                                                  "Введите определение столбцов (например: id INTEGER PRIMARY KEY, name TEXT, age INTEGER):")
             if columns_def:
-                try:
-                    query = f"CREATE TABLE {table_name} ({columns_def})"
-                    self.cursor.execute(query)
-                    self.conn.commit()
-
-                    messagebox.showinfo("Успех", f"Таблица '{table_name}' успешно создана")
-                    self.show_tables()
-
-                except sqlite3.Error as e:
-                    messagebox.showerror("Ошибка", f"Ошибка при создании таблицы: {e}")
+                self.run_ddl(f"CREATE TABLE {table_name} ({columns_def})",
+                             f"Таблица '{table_name}' успешно создана", "Ошибка при создании таблицы",
+                             self.show_tables)
 
     def drop_table(self):
         """Удаление таблицы"""
         table_name = simpledialog.askstring("Удаление таблицы", "Введите название таблицы для удаления:")
         if table_name and messagebox.askyesno("Подтверждение",
                                               f"Вы уверены, что хотите удалить таблицу '{table_name}'?"):
-            try:
-                self.cursor.execute(f"DROP TABLE {table_name}")
-                self.conn.commit()
-
-                messagebox.showinfo("Успех", f"Таблица '{table_name}' успешно удалена")
-                self.show_tables()
-
-            except sqlite3.Error as e:
-                messagebox.showerror("Ошибка", f"Ошибка при удалении таблицы: {e}")
+            self.invalidate_names(table_name)
+            self.run_ddl(f"DROP TABLE {table_name}", f"Таблица '{table_name}' успешно удалена",
+                         "Ошибка при удалении таблицы", self.show_tables)
 
     def add_column(self):
         """Добавление столбца в таблицу"""
@@ -563,202 +2373,212 @@ class HospitalDBApp:
             column_def = simpledialog.askstring("Добавление столбца",
                                                 "Введите определение столбца (например: new_column TEXT):")
             if column_def:
-                try:
-                    query = f"ALTER TABLE {table_name} ADD COLUMN {column_def}"
-                    self.cursor.execute(query)
-                    self.conn.commit()
-
-                    messagebox.showinfo("Успех", f"Столбец успешно добавлен в таблицу '{table_name}'")
-                    self.show_columns()
+                self.run_ddl(f"ALTER TABLE {table_name} ADD COLUMN {column_def}",
+                             f"Столбец успешно добавлен в таблицу '{table_name}'", "Ошибка при добавлении столбца",
+                             self.show_columns)
+
+    def run_ddl(self, query, message, error_message, on_success):
+        """Изменение схемы в фоне на соединении записи, по очереди с изменениями данных"""
+        def work(conn):
+            conn.execute(query)
+            conn.commit()
+
+        def on_done(result):
+            self.schema.invalidate()
+            messagebox.showinfo("Успех", message)
+            on_success()
+
+        self.run_query(work, on_done, error_message, "изменение структуры")
+
+    def update_column(self):
+        """Изменение определения столбца (с перестройкой таблицы)"""
+        table_name = simpledialog.askstring("Изменение столбца", "Введите название таблицы:")
+        if not table_name:
+            return
+        column = simpledialog.askstring("Изменение столбца", "Введите название столбца:")
+        if not column:
+            return
 
-                except sqlite3.Error as e:
-                    messagebox.showerror("Ошибка", f"Ошибка при добавлении столбца: {e}")
+        current = next((col for col in self.schema.columns(table_name) if col[1].lower() == column.lower()), None)
+        if current is None:
+            messagebox.showerror("Ошибка", f"Столбец '{column}' не найден в таблице '{table_name}'")
+            return
+        definition = simpledialog.askstring("Изменение столбца",
+                                            "Введите новое определение столбца (например: salary REAL NOT NULL):",
+                                            initialvalue=f"{current[1]} {current[2]}".strip())
+        if definition:
+            self.run_rebuild(table_name, column, definition, "Столбец успешно изменен", "изменение столбца")
+
+    def delete_column(self):
+        """Удаление столбца (с перестройкой таблицы)"""
+        table_name = simpledialog.askstring("Удаление столбца", "Введите название таблицы:")
+        if not table_name:
+            return
+        column = simpledialog.askstring("Удаление столбца", "Введите название столбца для удаления:")
+        if column and messagebox.askyesno("Подтверждение",
+                                          f"Вы уверены, что хотите удалить столбец '{column}' из таблицы '{table_name}'?"):
+            self.run_rebuild(table_name, column, None, "Столбец успешно удален", "удаление столбца")
+
+    def run_rebuild(self, table_name, column, definition, message, description):
+        """Перестройка таблицы в фоне: пачками, с ходом выполнения и отменой"""
+        def work(conn, batch_size, progress):
+            return rebuild_table(conn, table_name, column_change(column, definition), batch_size, progress)
+
+        def on_done(skipped):
+            self.schema.invalidate()
+            self.invalidate_names(table_name)
+            if skipped:
+                message_text = f"{message}. Не удалось пересоздать: {', '.join(skipped)}"
+            else:
+                message_text = message
+            if self.table_var.get().lower() == table_name.lower():
+                self.display_table_data(self.table_var.get())
+            messagebox.showinfo("Успех", message_text)
+            self.show_tables()
+
+        self.run_batched(work, on_done, "Ошибка при перестройке таблицы", description)
 
     # Методы для генерации отчетов
     def report_doctors_specializations(self):
         """Отчет: врачи и их специализации"""
-        try:
-            self.cursor.execute('''
-                SELECT first_name || ' ' || last_name AS full_name, specialization 
-                FROM doctors
-                ORDER BY full_name
-            ''')
-            results = self.cursor.fetchall()
-
-            self.reports_text.delete(1.0, tk.END)
-            self.reports_text.insert(tk.END, "Врачи и их специализации:\n\n")
-            for row in results:
-                self.reports_text.insert(tk.END, f"• {row[0]} - {row[1]}\n")
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Ошибка", f"Ошибка при формировании отчета: {e}")
+        self.run_paged_report('doctors_specializations', (), "Врачи и их специализации:\n\n",
+                              lambda row: f"• {row[0]} - {row[1]}\n", "врачи и специализации")
 
     def report_doctors_not_on_vacation(self):
         """Отчет: врачи не в отпуске с зарплатами"""
-        try:
-            self.cursor.execute('''
-                SELECT last_name, (salary_base + COALESCE(salary_bonus, 0)) AS total_salary
-                FROM doctors
-                WHERE on_vacation = 0
-                ORDER BY total_salary DESC
-            ''')
-            results = self.cursor.fetchall()
-
-            self.reports_text.delete(1.0, tk.END)
-            self.reports_text.insert(tk.END, "Врачи не в отпуске и их зарплаты:\n\n")
-            total_sum = 0
-            for row in results:
-                salary = row[1]
-                self.reports_text.insert(tk.END, f"• {row[0]} - {salary:,.2f} руб.\n")
-                total_sum += salary
-
-            self.reports_text.insert(tk.END, f"\nОбщая сумма зарплат: {total_sum:,.2f} руб.\n")
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Ошибка", f"Ошибка при формировании отчета: {e}")
+        # Список идет по индексу idx_doctors_vacation_total_id, итоги - из сводки doctor_payroll
+        self.run_paged_report('doctors_not_on_vacation', (), "Врачи не в отпуске и их зарплаты:\n\n",
+                              lambda row: f"• {row[0]} - {row[1]:,.2f} руб.\n", "врачи не в отпуске",
+                              (REPORT_QUERIES['doctors_payroll'], self.format_payroll))
+
+    def format_payroll(self, rows):
+        """Текст сводки зарплат по отделениям"""
+        lines = ["\nПо отделениям (работают / в отпуске, сумма зарплат работающих):\n"]
+        for name, active, vacation, salary in rows:
+            lines.append(f"• {name or 'Без отделения'}: {active} / {vacation}, {salary:,.2f} руб.\n")
+        lines.append(f"\nОбщая сумма зарплат: {sum(row[3] for row in rows):,.2f} руб.\n")
+        return ''.join(lines)
 
     def report_wards_by_department(self):
         """Отчет: палаты по отделениям"""
-        # Сначала покажем доступные отделения
-        try:
-            self.cursor.execute("SELECT name FROM departments")
-            departments = [row[0] for row in self.cursor.fetchall()]
-
-            if not departments:
-                messagebox.showwarning("Предупреждение", "В базе данных нет отделений")
-                return
-
-            department = simpledialog.askstring("Отчет",
-                                                f"Введите название отделения из списка: {', '.join(departments)}")
-            if department:
-                self.cursor.execute('''
-                    SELECT w.name, w.capacity
-                    FROM wards w
-                    JOIN departments d ON w.department_id = d.id
-                    WHERE d.name = ?
-                    ORDER BY w.name
-                ''', (department,))
-                results = self.cursor.fetchall()
-
-                self.reports_text.delete(1.0, tk.END)
-                self.reports_text.insert(tk.END, f"Палаты в отделении '{department}':\n\n")
-                total_capacity = 0
-                for row in results:
-                    self.reports_text.insert(tk.END, f"• {row[0]} (вместимость: {row[1]} чел.)\n")
-                    total_capacity += row[1]
-
-                self.reports_text.insert(tk.END, f"\nОбщая вместимость: {total_capacity} чел.\n")
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Ошибка", f"Ошибка при формировании отчета: {e}")
+        self.with_name_index('departments', self.ask_wards_department)
+
+    def ask_wards_department(self, index):
+        department = self.pick_name(index, "Отделение", "В базе данных нет отделений")
+        if department:
+            department_id, name = department
+            query = REPORT_QUERIES['wards_by_department']
+            self.run_paged_report('wards_by_department', (department_id,), f"Палаты в отделении '{name}':\n\n",
+                                  lambda row: f"• {row[0]} (вместимость: {row[1]} чел.)\n", "палаты по отделениям",
+                                  (f"SELECT TOTAL(capacity) FROM ({query})",
+                                   lambda totals: f"\nОбщая вместимость: {totals[0][0]:.0f} чел.\n"))
 
     def report_departments_by_sponsor(self):
         """Отчет: отделения по спонсорам"""
-        try:
-            self.cursor.execute("SELECT company_name FROM sponsors")
-            sponsors = [row[0] for row in self.cursor.fetchall()]
-
-            if not sponsors:
-                messagebox.showwarning("Предупреждение", "В базе данных нет спонсоров")
-                return
-
-            sponsor = simpledialog.askstring("Отчет",
-                                             f"Введите название компании-спонсора из списка: {', '.join(sponsors)}")
-            if sponsor:
-                self.cursor.execute('''
-                    SELECT DISTINCT d.name, d.description
-                    FROM departments d
-                    JOIN donations dn ON d.id = dn.department_id
-                    JOIN sponsors s ON dn.sponsor_id = s.id
-                    WHERE s.company_name = ?
-                ''', (sponsor,))
-                results = self.cursor.fetchall()
-
-                self.reports_text.delete(1.0, tk.END)
-                self.reports_text.insert(tk.END, f"Отделения, спонсируемые компанией '{sponsor}':\n\n")
-                for row in results:
-                    self.reports_text.insert(tk.END, f"• {row[0]}")
-                    if row[1]:
-                        self.reports_text.insert(tk.END, f" - {row[1]}")
-                    self.reports_text.insert(tk.END, "\n")
-
-        except sqlite3.Error as e:
-            messagebox.showerror("Ошибка", f"Ошибка при формировании отчета: {e}")
+        self.with_name_index('sponsors', self.ask_departments_sponsor)
+
+    def ask_departments_sponsor(self, index):
+        sponsor = self.pick_name(index, "Компания-спонсор", "В базе данных нет спонсоров")
+        if sponsor:
+            sponsor_id, name = sponsor
+            self.run_paged_report('departments_by_sponsor', (sponsor_id,),
+                                  f"Отделения, спонсируемые компанией '{name}':\n\n",
+                                  lambda row: f"• {row[0]} - {row[1]}\n" if row[1] else f"• {row[0]}\n",
+                                  "отделения по спонсорам")
+
+    def pick_name(self, index, label, empty_message):
+        """Выбор записи справочника в NamePickerDialog: (id, название) или None"""
+        if not len(index):
+            messagebox.showwarning("Предупреждение", empty_message)
+            return None
+
+        dialog = NamePickerDialog(self.root, "Отчет", label, index)
+        self.root.wait_window(dialog)
+        return dialog.result
 
     def report_donations_by_month(self):
-        """Отчет: пожертвования за месяц"""
+        """Отчет: пожертвования за месяц.
+
+        Итоги по отделениям берутся из donation_monthly, сами пожертвования
+        выводятся страницами по REPORT_PAGE_SIZE по ключу (дата, id).
+        """
         month_year = simpledialog.askstring("Отчет", "Введите месяц и год в формате ММ-ГГГГ (например: 01-2024):")
         if month_year:
             try:
-                # Преобразование ввода в формат даты
-                month, year = month_year.split('-')
-                start_date = f"{year}-{month}-01"
-
-                # Определение последнего дня месяца
-                if month in ['01', '03', '05', '07', '08', '10', '12']:
-                    end_date = f"{year}-{month}-31"
-                elif month in ['04', '06', '09', '11']:
-                    end_date = f"{year}-{month}-30"
-                else:
-                    # Февраль (учитываем високосный год)
-                    if int(year) % 4 == 0 and (int(year) % 100 != 0 or int(year) % 400 == 0):
-                        end_date = f"{year}-{month}-29"
-                    else:
-                        end_date = f"{year}-{month}-28"
-
-                self.cursor.execute('''
-                    SELECT d.name, s.company_name, dn.amount, dn.donation_date
-                    FROM donations dn
-                    JOIN departments d ON dn.department_id = d.id
-                    JOIN sponsors s ON dn.sponsor_id = s.id
-                    WHERE dn.donation_date BETWEEN ? AND ?
-                    ORDER BY dn.donation_date
-                ''', (start_date, end_date))
-                results = self.cursor.fetchall()
-
-                self.reports_text.delete(1.0, tk.END)
-                self.reports_text.insert(tk.END, f"Пожертвования за {month_year}:\n\n")
-                total = 0
-                for row in results:
-                    self.reports_text.insert(tk.END,
-                                             f"• Отделение: {row[0]}\n")
-                    self.reports_text.insert(tk.END,
-                                             f"  Спонсор: {row[1]}, Сумма: {row[2]:,.2f} руб., Дата: {row[3]}\n\n")
-                    total += row[2]
-
-                self.reports_text.insert(tk.END, f"Общая сумма пожертвований: {total:,.2f} руб.\n")
-
-            except (ValueError, sqlite3.Error) as e:
+                start = datetime.strptime(month_year.strip(), '%m-%Y').date()
+            except ValueError as e:
                 messagebox.showerror("Ошибка", f"Ошибка при формировании отчета: {e}")
+                return
+            end = (start + timedelta(days=32)).replace(day=1)
+            start_date, end_date = start.isoformat(), end.isoformat()
+
+            def work(conn):
+                totals = conn.execute(REPORT_QUERIES['donations_month_totals'], (start_date[:7],)).fetchall()
+                page = conn.execute(REPORT_QUERIES['donations_by_month'],
+                                    (start_date, 0, end_date, REPORT_PAGE_SIZE)).fetchall()
+                return totals, page
+
+            def render(result):
+                totals, page = result
+                generation = self.render_donations_by_month(month_year, totals)
+                self.render_donations_page(generation, end_date, page)
+
+            self.run_query(work, render, "Ошибка при формировании отчета", "пожертвования за месяц",
+                           readonly=True)
+
+    def render_donations_by_month(self, month_year, totals):
+        generation = self.start_report(f"Пожертвования за {month_year}:\n\n")
+        count = sum(row[1] for row in totals)
+        total = sum(row[2] for row in totals)
+        self.reports_text.insert(tk.END, ''.join(
+            f"• {row[0] or 'Без отделения'}: {row[1]} шт., {row[2]:,.2f} руб.\n" for row in totals))
+        self.reports_text.insert(tk.END, f"\nВсего пожертвований: {count}, "
+                                         f"общая сумма: {total:,.2f} руб.\n\nСписок пожертвований:\n\n")
+        return generation
+
+    def render_donations_page(self, generation, end_date, rows):
+        """Вывод страницы пожертвований и подготовка загрузки следующей"""
+        load_next = None
+        if len(rows) == REPORT_PAGE_SIZE:
+            after_date, after_id = rows[-1][4], rows[-1][0]
+
+            def load_next():
+                self.run_report(REPORT_QUERIES['donations_by_month'],
+                                (after_date, after_id, end_date, REPORT_PAGE_SIZE),
+                                lambda page: self.render_donations_page(generation, end_date, page),
+                                "пожертвования за месяц")
+
+        self.render_page(generation, rows, lambda row: (f"• Отделение: {row[1] or 'Без отделения'}\n"
+                                                        f"  Спонсор: {row[2] or 'Без спонсора'}, "
+                                                        f"Сумма: {row[3] or 0:,.2f} руб., Дата: {row[4]}\n\n"),
+                         load_next)
 
     def report_doctors_departments(self):
         """Отчет: врачи с указанием отделений"""
-        try:
-            self.cursor.execute('''
-                SELECT d.last_name, d.first_name, dep.name, d.specialization
-                FROM doctors d
-                JOIN departments dep ON d.department_id = dep.id
-                ORDER BY dep.name, d.last_name
-            ''')
-            results = self.cursor.fetchall()
-
-            self.reports_text.delete(1.0, tk.END)
-            self.reports_text.insert(tk.END, "Врачи и их отделения:\n\n")
-
-            current_department = ""
-            for row in results:
-                if row[2] != current_department:
-                    current_department = row[2]
-                    self.reports_text.insert(tk.END, f"\n{current_department}:\n")
-                self.reports_text.insert(tk.END, f"  • {row[0]} {row[1]} ({row[3]})\n")
+        department = None
 
-        except sqlite3.Error as e:
-            messagebox.showerror("Ошибка", f"Ошибка при формировании отчета: {e}")
+        def format_row(row):
+            # Заголовок отделения перед первым его врачом, в том числе на следующих страницах
+            nonlocal department
+            header = ""
+            if row[2] != department:
+                department = row[2]
+                header = f"\n{department}:\n"
+            return f"{header}  • {row[0]} {row[1]} ({row[3]})\n"
+
+        self.run_paged_report('doctors_departments', (), "Врачи и их отделения:\n\n",
+                              format_row, "врачи и отделения")
 
     def __del__(self):
         """Закрытие соединения с БД при уничтожении объекта"""
+        if getattr(self, 'pager', None) is not None:
+            self.pager.close()
+        if hasattr(self, 'executor'):
+            self.executor.close()
         if hasattr(self, 'conn'):
             self.conn.close()
+        if hasattr(self, 'db'):
+            self.db.close()
 
 
 class RecordInputDialog(tk.Toplevel):
@@ -845,6 +2665,78 @@ class RecordInputDialog(tk.Toplevel):
         self.destroy()
 
 
+class NamePickerDialog(tk.Toplevel):
+    """Выбор записи по названию с подсказками по мере ввода"""
+
+    def __init__(self, parent, title, label, index):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("400x350")
+        self.index = index
+        self.matches = []
+        self.result = None
+
+        self.transient(parent)
+        self.grab_set()
+
+        self.create_widgets(label)
+        self.update_matches()
+        self.entry.focus_set()
+
+    def create_widgets(self, label):
+        """Создание виджетов"""
+        main_frame = ttk.Frame(self)
+        main_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        ttk.Label(main_frame, text=f"{label} (начните вводить название):").pack(anchor='w')
+        self.text_var = tk.StringVar()
+        self.text_var.trace_add('write', lambda *args: self.update_matches())
+        self.entry = ttk.Entry(main_frame, textvariable=self.text_var)
+        self.entry.pack(fill='x', pady=5)
+        self.entry.bind('<Return>', lambda event: self.on_ok())
+        self.entry.bind('<Down>', lambda event: self.listbox.focus_set())
+
+        self.listbox = tk.Listbox(main_frame, height=10)
+        self.listbox.pack(fill='both', expand=True)
+        self.listbox.bind('<Double-Button-1>', lambda event: self.on_ok())
+        self.listbox.bind('<Return>', lambda event: self.on_ok())
+
+        # Кнопки
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(side='bottom', fill='x', pady=10)
+
+        ttk.Button(button_frame, text="OK", command=self.on_ok).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Отмена", command=self.on_cancel).pack(side='left', padx=5)
+
+    def update_matches(self):
+        """Обновление списка вариантов по введенному началу названия"""
+        self.matches = self.index.search(self.text_var.get().strip())
+        self.listbox.delete(0, tk.END)
+        for row_id, name in self.matches:
+            self.listbox.insert(tk.END, name)
+        if self.matches:
+            self.listbox.selection_set(0)
+
+    def on_ok(self):
+        """Выбор отмеченного варианта или записи с точно введенным названием"""
+        selection = self.listbox.curselection()
+        if selection:
+            self.result = self.matches[selection[0]]
+        else:
+            name = self.text_var.get().strip()
+            row_id = self.index.find(name)
+            if row_id is None:
+                messagebox.showwarning("Предупреждение", f"Название '{name}' не найдено", parent=self)
+                return
+            self.result = (row_id, name)
+        self.destroy()
+
+    def on_cancel(self):
+        """Обработка нажатия Отмена"""
+        self.result = None
+        self.destroy()
+
+
 def main():
     """Главная функция приложения"""
     root = tk.Tk()
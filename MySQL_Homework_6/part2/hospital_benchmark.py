@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+from hospital_app import (REPORT_QUERIES, REPORT_INDEXES, REPORT_PAGE_SIZE, create_schema, create_report_indexes,
+                          drop_report_indexes, create_donation_rollup, create_payroll_summary)
+from create_test_data import create_test_data
+
+
+def report_params(conn, rnd):
+    """Параметры отчетов: случайные отделение, спонсор и месяц из данных"""
+    department = conn.execute("SELECT id FROM departments ORDER BY random() LIMIT 1").fetchone()
+    sponsor = conn.execute("SELECT id FROM sponsors ORDER BY random() LIMIT 1").fetchone()
+    first, last = conn.execute("SELECT MIN(donation_date), MAX(donation_date) FROM donations").fetchone()
+    day = date.fromisoformat(first or date.today().isoformat())
+    if last:
+        day += timedelta(days=rnd.randrange((date.fromisoformat(last) - day).days + 1))
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+
+    return {
+        'doctors_specializations': (),
+        'doctors_not_on_vacation': (),
+        'wards_by_department': department or (0,),
+        'departments_by_sponsor': sponsor or (0,),
+        'donations_month_totals': (start.isoformat()[:7],),
+        'donations_by_month': (start.isoformat(), 0, end.isoformat(), REPORT_PAGE_SIZE),
+        'doctors_payroll': (),
+        'doctors_departments': (),
+    }
+
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def measure(conn, params, repeat=10):
+    """План и медианное время каждого отчета (с чтением всех строк)"""
+    results = {}
+    for name, query in REPORT_QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = conn.execute(query, params[name]).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {
+            'plan': query_plan(conn, query, params[name]),
+            'rows': len(rows),
+            'median_ms': timings[len(timings) // 2],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк отчетов базы 'Больница' без индексов и с индексами")
+    parser.add_argument('--db', default='bench_hospital.db', help="файл базы данных для бенчмарка")
+    parser.add_argument('--reuse', action='store_true', help="использовать уже сгенерированную базу")
+    parser.add_argument('--departments', type=int, default=50)
+    parser.add_argument('--sponsors', type=int, default=2000)
+    parser.add_argument('--wards', type=int, default=5000)
+    parser.add_argument('--doctors', type=int, default=20000)
+    parser.add_argument('--donations', type=int, default=1000000)
+    parser.add_argument('--examinations', type=int, default=0)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=10, help="число замеров на отчет")
+    parser.add_argument('--output', default='bench_hospital.json', help="файл для результатов в формате JSON")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db) and not args.reuse:
+        print(f"Файл {args.db} уже существует: удалите его или укажите --reuse")
+        return
+
+    if not args.reuse:
+        stats = create_test_data(args.db, args.departments, args.sponsors, args.wards, args.doctors,
+                                 args.donations, args.examinations, args.years, args.seed)
+        print(f"Сгенерировано пожертвований: {args.donations} за {stats['seconds']:.1f} с")
+
+    conn = sqlite3.connect(args.db)
+    try:
+        create_schema(conn)
+        create_donation_rollup(conn)
+        create_payroll_summary(conn)
+
+        params = report_params(conn, random.Random(args.seed))
+
+        drop_report_indexes(conn)
+        conn.execute("ANALYZE")
+        before = measure(conn, params, args.repeat)
+
+        start = time.perf_counter()
+        create_report_indexes(conn)
+        conn.execute("ANALYZE")
+        index_seconds = time.perf_counter() - start
+        after = measure(conn, params, args.repeat)
+    finally:
+        conn.close()
+
+    output = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'dataset': {name: getattr(args, name) for name in
+                    ('departments', 'sponsors', 'wards', 'doctors', 'donations', 'examinations', 'years', 'seed')},
+        'indexes': {name: f"{table} ({', '.join(columns)})" for name, (table, columns) in REPORT_INDEXES.items()},
+        'index_build_seconds': index_seconds,
+        'params': params,
+        'before': before,
+        'after': after,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+
+    for name in REPORT_QUERIES:
+        print(f"\n{name}: {before[name]['median_ms']:.2f} мс -> {after[name]['median_ms']:.2f} мс"
+              f" (строк: {after[name]['rows']})")
+        print("  без индексов:")
+        for step in before[name]['plan']:
+            print(f"    {step}")
+        print("  с индексами:")
+        for step in after[name]['plan']:
+            print(f"    {step}")
+    print(f"\nИндексы построены за {index_seconds:.1f} с")
+    print(f"Результаты сохранены в файл: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
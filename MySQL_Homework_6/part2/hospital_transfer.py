@@ -0,0 +1,48 @@
+import argparse
+import os
+import sqlite3
+
+from hospital_app import (DB_NAME, TRANSFER_TABLES, TRANSFER_CHUNK_SIZE, create_schema, create_donation_rollup,
+                          create_payroll_summary, export_tables, import_tables)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт и экспорт таблиц базы 'Больница' в файлах CSV")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('directory', help="каталог с файлами <таблица>.csv")
+    parser.add_argument('--db', default=DB_NAME, help="файл базы данных")
+    parser.add_argument('--tables', nargs='+', choices=TRANSFER_TABLES, help="таблицы (по умолчанию все)")
+    parser.add_argument('--chunk-size', type=int, default=TRANSFER_CHUNK_SIZE)
+    parser.add_argument('--replace', action='store_true', help="при импорте удалить существующие строки таблиц")
+    args = parser.parse_args()
+
+    # Порядок загрузки задается TRANSFER_TABLES, а не порядком в командной строке
+    tables = tuple(table for table in TRANSFER_TABLES if not args.tables or table in args.tables)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        create_schema(conn)
+        create_donation_rollup(conn)
+        create_payroll_summary(conn)
+        if args.action == 'export':
+            os.makedirs(args.directory, exist_ok=True)
+            stats = export_tables(conn, args.directory, tables, args.chunk_size)
+        else:
+            stats = import_tables(conn, args.directory, tables, args.chunk_size, args.replace)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Ошибка при {'загрузке' if args.action == 'import' else 'выгрузке'}: {e}")
+        return
+    finally:
+        conn.close()
+
+    print("Загружено строк:" if args.action == 'import' else "Выгружено строк:")
+    for table in tables:
+        if table in stats:
+            print(f"  {table}: {stats[table]}")
+    if stats.get('fk_violations'):
+        print(f"Строк с нарушением внешних ключей: {stats['fk_violations']}")
+    print(f"Время: {stats['seconds']:.2f} с, скорость: {stats['rows_per_sec']:,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()